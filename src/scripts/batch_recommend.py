@@ -0,0 +1,207 @@
+import sys
+import os
+import csv
+import json
+import time
+import argparse
+import multiprocessing
+from collections import deque
+from itertools import islice
+
+import numpy as np
+
+from recommend import check_budget, load_model, recommend_many, label_codes
+from telemetry import log_info
+
+DEFAULT_CHUNK_SIZE = 10000
+
+def read_records(path):
+    """Yield raw JSONL lines, or dicts for a CSV file ('-' reads JSONL from stdin)"""
+    if path == '-':
+        for line in sys.stdin:
+            line = line.strip()
+            if line:
+                yield line
+        return
+
+    with open(path, newline='', encoding='utf-8') as f:
+        if os.path.splitext(path)[1].lower() == '.csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+
+def parse_record(record):
+    """Profile dict from a raw JSONL line, or the ValueError if the line is not valid JSON"""
+    if not isinstance(record, str):
+        return record
+    try:
+        return json.loads(record)
+    except ValueError as e:
+        return e
+
+def parse_records(records):
+    return [parse_record(r) for r in records]
+
+def read_profiles(path):
+    """Yield profiles from a JSONL or CSV file ('-' reads JSONL from stdin); malformed lines come through as errors"""
+    for record in read_records(path):
+        yield parse_record(record)
+
+def iter_chunks(profiles, chunk_size):
+    """Group the profile stream into lists of at most chunk_size profiles"""
+    profiles = iter(profiles)
+    while True:
+        chunk = list(islice(profiles, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def score_chunk(model_data, chunk, k, offset=0):
+    """Return one response dict per profile in chunk, in input order
+
+    offset is the position of the chunk's first profile in the whole input,
+    so profiles without an id are numbered by their input line.
+    """
+    ids, budgets, weathers, activities, errors = [], [], [], [], {}
+    for i, profile in enumerate(chunk):
+        if not isinstance(profile, dict):
+            ids.append(offset + i)
+            errors[i] = f"Invalid input: malformed JSON ({str(profile)})" if isinstance(profile, ValueError) \
+                else "Invalid input: profile must be a JSON object"
+            budgets.append(0.0)
+            weathers.append('')
+            activities.append('')
+            continue
+        ids.append(profile.get('id', offset + i))
+        try:
+            budget = float(profile['budget'])
+            check_budget(budget)
+            budgets.append(budget)
+            weathers.append(str(profile['weather']))
+            activities.append(str(profile['activity']))
+        except (KeyError, TypeError, ValueError) as e:
+            errors[i] = f"Invalid input: {str(e)}"
+            budgets.append(0.0)
+            weathers.append('')
+            activities.append('')
+
+    weather_ok = label_codes(weathers, model_data['weather_map']) >= 0
+    activity_ok = label_codes(activities, model_data['activity_map']) >= 0
+    for i in np.flatnonzero(~weather_ok).tolist():
+        errors.setdefault(i, f"Invalid input: Invalid weather preference. Must be one of: {', '.join(model_data['weather_map'].keys())}")
+    for i in np.flatnonzero(~activity_ok).tolist():
+        errors.setdefault(i, f"Invalid input: Invalid activity preference. Must be one of: {', '.join(model_data['activity_map'].keys())}")
+
+    rows = np.flatnonzero(weather_ok & activity_ok).tolist()
+    results = recommend_many(model_data,
+                             [budgets[i] for i in rows],
+                             [weathers[i] for i in rows],
+                             [activities[i] for i in rows], k)
+    results = dict(zip(rows, results))
+
+    responses = []
+    for i, profile_id in enumerate(ids):
+        if i in results:
+            responses.append({"id": profile_id, "success": True, "recommendations": results[i]})
+        else:
+            responses.append({"id": profile_id, "success": False, "error": errors[i]})
+    return responses
+
+def run_batch(model_data, profiles, out, k=5, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Score a stream of profiles chunk by chunk, writing JSONL responses to out"""
+    total = 0
+    start = time.perf_counter()
+    for chunk in iter_chunks(profiles, chunk_size):
+        for response in score_chunk(model_data, chunk, k, total):
+            out.write(json.dumps(response) + "\n")
+        total += len(chunk)
+    elapsed = time.perf_counter() - start
+    return {"profiles": total, "seconds": round(elapsed, 3),
+            "profiles_per_second": round(total / elapsed, 1) if elapsed > 0 else None}
+
+_worker_model = None
+_worker_k = None
+
+def _init_worker(k):
+    """Process pool initializer: map the model artifact once per worker"""
+    global _worker_model, _worker_k
+    _worker_model = load_model()
+    _worker_k = k
+
+def _score_records(records, offset):
+    """Parse, score and serialize one chunk inside a worker; returns (pid, profiles, seconds, jsonl)"""
+    start = time.perf_counter()
+    responses = score_chunk(_worker_model, parse_records(records), _worker_k, offset)
+    text = ''.join(json.dumps(response) + "\n" for response in responses)
+    return os.getpid(), len(records), time.perf_counter() - start, text
+
+def run_parallel(records, out, k=5, chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+    """Score chunks on a process pool, writing their JSONL in input order
+
+    Each worker opens the memory-mapped artifact itself, so the feature
+    matrix is shared through the page cache rather than copied. Parsing and
+    serialization happen in the workers; the parent only moves lines. At
+    most two chunks per worker are in flight, which bounds memory on
+    arbitrarily long inputs.
+    """
+    workers = workers or os.cpu_count() or 1
+    total = 0
+    per_worker = {}
+    start = time.perf_counter()
+    with multiprocessing.get_context().Pool(workers, initializer=_init_worker, initargs=(k,)) as pool:
+        pending = deque()
+
+        def write_next():
+            nonlocal total
+            pid, count, seconds, text = pending.popleft().get()
+            out.write(text)
+            total += count
+            stats = per_worker.setdefault(pid, {"pid": pid, "chunks": 0, "profiles": 0, "busy_seconds": 0.0})
+            stats["chunks"] += 1
+            stats["profiles"] += count
+            stats["busy_seconds"] += seconds
+
+        offset = 0
+        for chunk in iter_chunks(records, chunk_size):
+            pending.append(pool.apply_async(_score_records, (chunk, offset)))
+            offset += len(chunk)
+            if len(pending) >= 2 * workers:
+                write_next()
+        while pending:
+            write_next()
+
+    elapsed = time.perf_counter() - start
+    for stats in per_worker.values():
+        stats["profiles_per_second"] = round(stats["profiles"] / stats["busy_seconds"], 1) \
+            if stats["busy_seconds"] > 0 else None
+        stats["busy_seconds"] = round(stats["busy_seconds"], 3)
+    return {"profiles": total, "seconds": round(elapsed, 3),
+            "profiles_per_second": round(total / elapsed, 1) if elapsed > 0 else None,
+            "workers": workers, "per_worker": sorted(per_worker.values(), key=lambda s: s["pid"])}
+
+def main():
+    parser = argparse.ArgumentParser(description="Score many preference profiles in one run")
+    parser.add_argument('input', help="JSONL or CSV file of profiles (budget, weather, activity, optional id); '-' for stdin")
+    parser.add_argument('-o', '--output', default='-', help="JSONL output file (default: stdout)")
+    parser.add_argument('-k', type=int, default=5, help="Recommendations per profile")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Profiles scored per vectorized call")
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help="Worker processes; 0 uses every core, 1 scores in this process (default)")
+    args = parser.parse_args()
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        if args.workers == 1:
+            stats = run_batch(load_model(), read_profiles(args.input), out, args.k, args.chunk_size)
+        else:
+            stats = run_parallel(read_records(args.input), out, args.k, args.chunk_size, args.workers or None)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    log_info("Batch complete", stats)
+
+if __name__ == "__main__":
+    main()
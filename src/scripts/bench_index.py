@@ -0,0 +1,89 @@
+import json
+import time
+import argparse
+import numpy as np
+
+from index import BruteForceIndex, IVFIndex
+from recommend import build_query_matrix
+
+WEATHER_MAP = {'cold': 0, 'cool': 0.33, 'mild': 0.66, 'warm': 1}
+ACTIVITY_MAP = {
+    'beach': [1, 0, 0, 0, 0],
+    'culture': [0, 1, 0, 0, 0],
+    'history': [0, 0, 1, 0, 0],
+    'technology': [0, 0, 0, 1, 0],
+    'urban': [0, 0, 0, 0, 1]
+}
+
+def synthetic_features(n, seed=0):
+    """Random (n, 12) float32 catalogue laid out like train_model.py features"""
+    rng = np.random.default_rng(seed)
+    features = np.empty((n, 12), dtype=np.float32)
+    features[:, 0] = rng.integers(10, 101, n) * 50 / 5000
+    features[:, 1] = np.array(list(WEATHER_MAP.values()), dtype=np.float32)[rng.integers(0, len(WEATHER_MAP), n)]
+    features[:, 2:7] = np.eye(len(ACTIVITY_MAP), dtype=np.float32)[rng.integers(0, len(ACTIVITY_MAP), n)]
+    features[:, 7:] = rng.integers(3, 11, (n, 5)) / 10
+    return features
+
+def synthetic_queries(n, seed=1):
+    """Random preference queries encoded the way recommend.py encodes requests"""
+    rng = np.random.default_rng(seed)
+    weathers = list(WEATHER_MAP)
+    activities = list(ACTIVITY_MAP)
+    return build_query_matrix(
+        rng.uniform(0, 6000, n),
+        [weathers[i] for i in rng.integers(0, len(weathers), n)],
+        [activities[i] for i in rng.integers(0, len(activities), n)],
+        WEATHER_MAP, ACTIVITY_MAP
+    )
+
+def timed_search(index, queries, k, **params):
+    start = time.perf_counter()
+    distances, indices = index.search(queries, k, **params)
+    elapsed = time.perf_counter() - start
+    return distances, indices, elapsed
+
+def recall_at_k(exact_distances, approx_distances):
+    """Fraction of results within the exact k-th distance, so ties count as hits"""
+    cutoff = exact_distances[:, -1:] * (1 + 1e-6)
+    return float((approx_distances <= cutoff).mean())
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k and QPS of the IVF index against exact search")
+    parser.add_argument('--rows', type=int, default=200000, help="Synthetic catalogue size")
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('-k', type=int, default=5)
+    parser.add_argument('--n-lists', type=int, default=None, help="IVF cells (default 4 * sqrt(rows))")
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    features = synthetic_features(args.rows)
+    queries = synthetic_queries(args.queries)
+
+    exact = BruteForceIndex(features)
+    exact_d, _, exact_s = timed_search(exact, queries, args.k)
+    report = {
+        "rows": args.rows,
+        "queries": args.queries,
+        "k": args.k,
+        "exact": {"qps": round(args.queries / exact_s, 1)},
+        "ivf": []
+    }
+
+    start = time.perf_counter()
+    ivf = IVFIndex.build(features, n_lists=args.n_lists)
+    report["ivf_build_seconds"] = round(time.perf_counter() - start, 3)
+    report["n_lists"] = int(len(ivf.centroids))
+
+    for nprobe in args.nprobe:
+        approx_d, _, approx_s = timed_search(ivf, queries, args.k, nprobe=nprobe)
+        report["ivf"].append({
+            "nprobe": nprobe,
+            f"recall@{args.k}": round(recall_at_k(exact_d, approx_d), 4),
+            "qps": round(args.queries / approx_s, 1)
+        })
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import json
+import time
+import random
+import argparse
+
+from suggest_activities import (KEYWORD_RULES, default_features, destination_features, normalize_name,
+                                keyword_features, get_destination_features, resolve_destination)
+
+def substring_scan(name):
+    """Reference: one substring scan per keyword rule, as the per-request fallback used to run"""
+    features = default_features.copy()
+    for words, values, floors in KEYWORD_RULES:
+        if any(word in name for word in words):
+            for key, floor in floors.items():
+                features[key] = max(features[key], floor)
+            features.update(values)
+    return features
+
+def nested_lookup(name):
+    """Reference: walk every category of the nested destination table"""
+    for category in destination_features.values():
+        if name in category:
+            return category[name]
+    return None
+
+def synthetic_names(n, seed=0):
+    """Free-text destination names mixing known places, rule keywords and filler words"""
+    rng = random.Random(seed)
+    known = [name for category in destination_features.values() for name in category]
+    keywords = [word for words, _, _ in KEYWORD_RULES for word in words]
+    filler = ['north', 'grand', 'santa', 'valley', 'springs', 'heights', 'river', 'del', 'saint', 'new']
+    names = []
+    for _ in range(n):
+        if rng.random() < 0.3:
+            names.append(rng.choice(known))
+        else:
+            words = rng.sample(filler, rng.randint(1, 3)) + rng.sample(keywords, rng.randint(0, 2))
+            rng.shuffle(words)
+            names.append(' '.join(words).title())
+    return names
+
+def per_name_us(fn, names, repeats):
+    """Best-of-repeats mean time per name in microseconds"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for name in names:
+            fn(name)
+        best = min(best, time.perf_counter() - start)
+    return round(best / len(names) * 1e6, 3)
+
+def main():
+    parser = argparse.ArgumentParser(description="Destination feature resolution: compiled matcher against substring scans")
+    parser.add_argument('--names', type=int, default=20000)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    names = synthetic_names(args.names)
+    normalized = [normalize_name(name) for name in names]
+    report = {
+        "names": args.names,
+        "distinct": len(set(normalized)),
+        "us_per_name": {
+            "nested_lookup_and_scan": per_name_us(lambda n: nested_lookup(n) or substring_scan(n.lower()),
+                                                  names, args.repeats),
+            "substring_scan": per_name_us(substring_scan, normalized, args.repeats),
+            "compiled_matcher": per_name_us(keyword_features, normalized, args.repeats),
+            "normalize_name": per_name_us(normalize_name, names, args.repeats)
+        }
+    }
+    resolve_destination.cache_clear()
+    report["us_per_name"]["memoized_cold"] = per_name_us(get_destination_features, names, 1)
+    report["us_per_name"]["memoized_warm"] = per_name_us(get_destination_features, names, args.repeats)
+    report["memo"] = resolve_destination.cache_info()._asdict()
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+from bench_index import WEATHER_MAP, ACTIVITY_MAP, synthetic_features, synthetic_queries
+from filters import ATTRIBUTES_FILE
+from model_store import write_artifact
+from recommend import (N_NEIGHBORS, decode_neighbors, kneighbors, load_model, recommend_page, success_response,
+                       _page_cache, _page_cache_lock)
+from suggest_activities import activity_index, destination_features, suggest_activities
+
+DEFAULT_SIZES = [30, 1000, 10000, 100000, 1000000]
+DEFAULT_THRESHOLD = 0.25
+NOISE_FLOOR_US = 20
+COMPARED_PERCENTILES = ['p50_us', 'p90_us']
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+COLD_START = '''
+import sys, json, time
+start = time.perf_counter()
+import recommend
+imported = time.perf_counter()
+recommend.load_model(sys.argv[1])
+loaded = time.perf_counter()
+print(json.dumps({"import": imported - start, "load_model": loaded - imported}))
+'''
+
+def summarize(seconds):
+    """Latency percentiles in microseconds"""
+    samples = np.asarray(seconds) * 1e6
+    p50, p90, p99 = np.percentile(samples, [50, 90, 99])
+    return {
+        "n": len(samples),
+        "mean_us": round(float(samples.mean()), 1),
+        "p50_us": round(float(p50), 1),
+        "p90_us": round(float(p90), 1),
+        "p99_us": round(float(p99), 1),
+        "max_us": round(float(samples.max()), 1)
+    }
+
+def time_calls(fn, args, warmup):
+    """Per-call wall times of fn over args, after warming up on the first few"""
+    for a in args[:warmup]:
+        fn(*a)
+    times = []
+    for a in args:
+        start = time.perf_counter()
+        fn(*a)
+        times.append(time.perf_counter() - start)
+    return times
+
+def build_catalogue(root, rows, seed):
+    """Synthetic artifact with the train_model.py schema and derived files, reused across runs"""
+    from train_model import build_derived
+
+    artifact_dir = os.path.join(root, f"rows-{rows}-seed-{seed}")
+    if os.path.exists(os.path.join(artifact_dir, ATTRIBUTES_FILE)):
+        return artifact_dir, None
+    start = time.perf_counter()
+    features = synthetic_features(rows, seed)
+    names = [f"Destination {i}" for i in range(rows)]
+    write_artifact(artifact_dir, features, names, WEATHER_MAP, ACTIVITY_MAP, {"n_neighbors": N_NEIGHBORS})
+    build_derived(artifact_dir)
+    return artifact_dir, round(time.perf_counter() - start, 3)
+
+def cold_start(artifact_dir, repeats):
+    """Import plus load_model() in a fresh interpreter each time"""
+    phases = {"import": [], "load_model": [], "total": []}
+    for _ in range(repeats):
+        result = subprocess.run([sys.executable, '-c', COLD_START, artifact_dir], cwd=SCRIPT_DIR,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True, text=True)
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        phases["import"].append(timings["import"])
+        phases["load_model"].append(timings["load_model"])
+        phases["total"].append(timings["import"] + timings["load_model"])
+    return {phase: summarize(times) for phase, times in phases.items()}
+
+def uncached_page(model_data, budget, weather, activity, k):
+    with _page_cache_lock:
+        _page_cache.clear()
+    recommendations, next_cursor = recommend_page(model_data, budget, weather, activity, k)
+    return success_response(recommendations, next_cursor)
+
+def bench_catalogue(artifact_dir, n_queries, k, warmup, seed):
+    """Query-path latencies for one catalogue"""
+    model_data = load_model(artifact_dir)
+    rng = np.random.default_rng(seed)
+    queries = synthetic_queries(n_queries, seed)
+    budgets = rng.uniform(0, 6000, n_queries).round(2).tolist()
+    weathers = [list(WEATHER_MAP)[i] for i in rng.integers(0, len(WEATHER_MAP), n_queries)]
+    activities = [list(ACTIVITY_MAP)[i] for i in rng.integers(0, len(ACTIVITY_MAP), n_queries)]
+
+    distances, indices = kneighbors(model_data, queries, k)
+    return {
+        "kneighbors": summarize(time_calls(lambda q: kneighbors(model_data, q, k),
+                                           [(queries[i:i + 1],) for i in range(n_queries)], warmup)),
+        "response_build": summarize(time_calls(
+            lambda d, i: success_response(decode_neighbors(model_data, i, d)[0]),
+            [(distances[j:j + 1], indices[j:j + 1]) for j in range(n_queries)], warmup)),
+        "recommend_page": summarize(time_calls(
+            lambda b, w, a: uncached_page(model_data, b, w, a, k),
+            list(zip(budgets, weathers, activities)), warmup))
+    }
+
+def bench_suggest(n_calls, warmup, seed):
+    """suggest_activities() per call over random destinations, weather, types and budgets"""
+    rng = random.Random(seed)
+    places = [name for category in destination_features.values() for name in category]
+    places += [f"{rng.choice(['North', 'Santa', 'Grand'])} {rng.choice(['Beach', 'Valley', 'Harbor'])}"
+               for _ in range(len(places))]
+    types = list(activity_index['types'])
+    calls = [(rng.choice(places), rng.choice(list(WEATHER_MAP)), rng.choice(types), rng.uniform(200, 6000))
+             for _ in range(n_calls)]
+    return summarize(time_calls(suggest_activities, calls, warmup))
+
+def find_regressions(report, baseline, threshold, noise_floor_us):
+    """Stages whose compared percentiles grew more than threshold (and the noise floor) over the baseline"""
+    regressions = []
+    for name, stage in report["stages"].items():
+        before = baseline.get("stages", {}).get(name)
+        if before is None:
+            continue
+        for metric in COMPARED_PERCENTILES:
+            old, new = before.get(metric), stage.get(metric)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + threshold) and new - old > noise_floor_us:
+                regressions.append({"stage": name, "metric": metric, "baseline": old, "current": new,
+                                    "change": round(new / old - 1, 3) if old else None})
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency benchmarks for the recommendation and activity engines")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Synthetic catalogue sizes")
+    parser.add_argument('--queries', type=int, default=1000, help="Timed calls per stage")
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--cold-starts', type=int, default=5, help="Fresh interpreters per catalogue")
+    parser.add_argument('-k', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'travel-bench'),
+                        help="Where synthetic artifacts are built and kept between runs")
+    parser.add_argument('-o', '--output', default='-', help="Results JSON ('-' for stdout)")
+    parser.add_argument('--baseline', default=None, help="Earlier results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed relative slowdown of p50/p90 before failing")
+    parser.add_argument('--noise-floor-us', type=float, default=NOISE_FLOOR_US,
+                        help="Slowdowns smaller than this many microseconds never fail")
+    args = parser.parse_args()
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count()
+        },
+        "config": {"queries": args.queries, "warmup": args.warmup, "cold_starts": args.cold_starts,
+                   "k": args.k, "seed": args.seed},
+        "build_seconds": {},
+        "stages": {}
+    }
+
+    for rows in args.sizes:
+        artifact_dir, build_seconds = build_catalogue(args.workdir, rows, args.seed)
+        if build_seconds is not None:
+            report["build_seconds"][str(rows)] = build_seconds
+        for phase, stats in cold_start(artifact_dir, args.cold_starts).items():
+            report["stages"][f"cold_start.{phase}@{rows}"] = stats
+        for stage, stats in bench_catalogue(artifact_dir, args.queries, args.k, args.warmup, args.seed).items():
+            report["stages"][f"{stage}@{rows}"] = stats
+    report["stages"]["suggest_activities"] = bench_suggest(args.queries, args.warmup, args.seed)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        report["regressions"] = find_regressions(report, baseline, args.threshold, args.noise_floor_us)
+
+    text = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(text)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+
+    if report.get("regressions"):
+        print(json.dumps({"regressions": report["regressions"]}), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import json
+import time
+import argparse
+import numpy as np
+
+from index import BruteForceIndex
+from bench_index import synthetic_features, synthetic_queries
+
+def latency_ms(fn, repeats):
+    """Median and p95 wall time of fn() in milliseconds"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"p50_ms": round(float(np.percentile(samples, 50)), 3),
+            "p95_ms": round(float(np.percentile(samples, 95)), 3)}
+
+def full_sort_search(index, query, k):
+    """Reference: exact distances followed by a full stable argsort"""
+    diff = query[None, :] - index.features
+    distances = np.sqrt(np.einsum('nf,nf->n', diff, diff))
+    order = np.argsort(distances, kind='stable')[:k]
+    return distances[order], order
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-query search latency as a function of k")
+    parser.add_argument('--rows', type=int, default=100000, help="Synthetic catalogue size")
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('-k', type=int, nargs='+', default=[1, 5, 8, 20, 50, 100, 500, 1000])
+    args = parser.parse_args()
+
+    index = BruteForceIndex(synthetic_features(args.rows))
+    query = synthetic_queries(1)
+    report = {"rows": args.rows, "repeats": args.repeats, "results": []}
+
+    for k in args.k:
+        report["results"].append({
+            "k": k,
+            "partial_topk": latency_ms(lambda: index.search(query, k), args.repeats),
+            "full_sort": latency_ms(lambda: full_sort_search(index, query[0], k), args.repeats)
+        })
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
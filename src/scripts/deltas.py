@@ -0,0 +1,370 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import contextlib
+import subprocess
+import numpy as np
+
+from model_store import HEADER_FILE, ArtifactBuilder, commit_dir, open_artifact, read_header, write_artifact
+from index import search_rows
+from filters import attribute_index
+from telemetry import log_info, log_warning
+
+DELTA_DIR = 'deltas'
+MANIFEST_FILE = 'manifest.json'
+# Fold deltas into the base once there are this many segments, or this share of the base is shadowed
+COMPACT_SEGMENTS = 8
+COMPACT_FRACTION = 0.05
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class RowStack:
+    """Read-only view of a base array followed by a small delta array, indexed by global row"""
+
+    def __init__(self, base, extra):
+        self.base = base
+        self.extra = np.asarray(extra, dtype=base.dtype)
+        self.n_base = len(base)
+        self.shape = (self.n_base + len(self.extra),) + tuple(base.shape[1:])
+        self.dtype = base.dtype
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("RowStack slices must be contiguous")
+            parts = [np.asarray(self.base[start:min(stop, self.n_base)]),
+                     self.extra[max(start - self.n_base, 0):max(stop - self.n_base, 0)]]
+            return np.concatenate(parts)
+        rows = np.asarray(key)
+        flat = rows.ravel()
+        out = np.empty((len(flat),) + self.shape[1:], dtype=self.dtype)
+        in_base = flat < self.n_base
+        out[in_base] = self.base[flat[in_base]]
+        out[~in_base] = self.extra[flat[~in_base] - self.n_base]
+        return out.reshape(rows.shape + self.shape[1:])
+
+class DeltaIndex:
+    """Search the base index and the delta rows together, hiding base rows the deltas replaced or removed
+
+    The base is asked for k plus the number of hidden rows, so every query
+    still has k live base candidates; delta rows are few and searched exactly.
+    """
+
+    kind = 'delta'
+
+    def __init__(self, base, n_base, removed, delta_features):
+        self.base = base
+        self.n_base = n_base
+        self.removed = removed
+        self.delta_features = delta_features
+
+    def __len__(self):
+        return self.n_base - len(self.removed) + len(self.delta_features)
+
+    def search(self, queries, k, **params):
+        queries = np.asarray(queries, dtype=float)
+        k = min(k, len(self))
+        distances, indices = self.base.search(queries, min(k + len(self.removed), self.n_base), **params)
+        if len(self.removed):
+            distances = np.where(np.isin(indices, self.removed), np.inf, distances)
+        if len(self.delta_features):
+            delta_d, delta_i = search_rows(self.delta_features, queries, k)
+            distances = np.concatenate([distances, delta_d], axis=1)
+            indices = np.concatenate([indices, delta_i + self.n_base], axis=1)
+        order = np.lexsort((indices, distances), axis=1)[:, :k]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
+class DeltaAttributeIndex:
+    """Attribute filtering over the base index plus the delta rows, skipping hidden base rows"""
+
+    def __init__(self, base, n_base, removed, delta_labels, delta_display):
+        self.base = base
+        self.n_base = n_base
+        self.removed = removed
+        self.delta_labels = delta_labels
+        self.delta_display = delta_display
+
+    def candidate_rows(self, constraints):
+        rows = self.base.candidate_rows(constraints)
+        if len(self.removed):
+            rows = rows[~np.isin(rows, self.removed)]
+        keep = np.ones(len(self.delta_labels), dtype=bool)
+        if constraints.get('min_budget') is not None:
+            keep &= self.delta_display[:, 0] >= constraints['min_budget']
+        if constraints.get('max_budget') is not None:
+            keep &= self.delta_display[:, 0] <= constraints['max_budget']
+        if constraints.get('min_safety') is not None:
+            keep &= self.delta_display[:, 1] >= constraints['min_safety']
+        if constraints.get('weathers') is not None:
+            keep &= np.isin(self.delta_labels[:, 0], constraints['weathers'])
+        if constraints.get('activities') is not None:
+            keep &= np.isin(self.delta_labels[:, 1], constraints['activities'])
+        return np.concatenate([rows, np.flatnonzero(keep) + self.n_base])
+
+def delta_dir(artifact_dir):
+    return os.path.join(artifact_dir, DELTA_DIR)
+
+def read_manifest(artifact_dir):
+    """The artifact's delta manifest, or None if it has no deltas"""
+    path = os.path.join(delta_dir(artifact_dir), MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def write_manifest(artifact_dir, manifest):
+    tmp_path = os.path.join(delta_dir(artifact_dir), MANIFEST_FILE + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(delta_dir(artifact_dir), MANIFEST_FILE))
+
+def artifact_fingerprint(artifact_dir):
+    """Cheap change detector: identity of the header and the delta manifest"""
+    fingerprint = []
+    for path in (os.path.join(artifact_dir, HEADER_FILE), os.path.join(delta_dir(artifact_dir), MANIFEST_FILE)):
+        try:
+            st = os.stat(path)
+            fingerprint.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            fingerprint.append(None)
+    return tuple(fingerprint)
+
+@contextlib.contextmanager
+def update_lock(artifact_dir):
+    """Serialize delta writers and compaction; the lock file sits beside the directory compaction replaces"""
+    path = os.path.abspath(artifact_dir).rstrip(os.sep) + '.lock'
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def live_segments(artifact_dir, header):
+    """Opened delta segments that apply to this base, oldest first"""
+    manifest = read_manifest(artifact_dir)
+    if not manifest or not manifest['segments']:
+        return []
+    if manifest['base_hash'] != header['content_hash']:
+        log_warning("Ignoring deltas written for another base", {"artifact": artifact_dir})
+        return []
+    return [open_artifact(os.path.join(delta_dir(artifact_dir), name)) for name in manifest['segments']]
+
+def resolve_segments(base_names, segments):
+    """Hidden base rows and the surviving delta rows after replaying segments in order
+
+    Within a segment removals apply before upserts; a later write of a name
+    supersedes every earlier one, including the base row.
+    """
+    touched = set()
+    latest = {}
+    for s, segment in enumerate(segments):
+        for name in segment['header'].get('removed', []):
+            touched.add(name)
+            latest.pop(name, None)
+        for j, name in enumerate(segment['destinations']):
+            touched.add(name)
+            latest[name] = (s, j)
+
+    removed = np.array([i for i, name in enumerate(base_names) if name in touched], dtype=np.int64)
+    picks = sorted(latest.values())
+    delta = {'names': [segments[s]['destinations'][j] for s, j in picks]}
+    for key, dtype, width in (('features', np.float32, 12), ('labels', np.int16, 2), ('display', np.float64, 6)):
+        delta[key] = np.array([segments[s][key][j] for s, j in picks], dtype=dtype).reshape(len(picks), -1) \
+            if picks else np.empty((0, width), dtype=dtype)
+    return removed, delta
+
+def merge_deltas(model_data):
+    """Overlay the artifact's delta segments on an opened base model
+
+    The merged model keeps the base memory maps and appends delta rows after
+    them; its content hash covers the base and the segments, so caches keyed
+    on it never mix versions. Returns model_data unchanged when there are no
+    deltas.
+    """
+    artifact_dir = model_data['artifact_dir']
+    segments = live_segments(artifact_dir, model_data['header'])
+    if not segments:
+        return model_data
+
+    removed, delta = resolve_segments(model_data['destinations'], segments)
+    n_base = len(model_data['features'])
+    base_attributes = attribute_index(model_data)
+    header = dict(model_data['header'])
+    header['base_hash'] = header['content_hash']
+    last = segments[-1]['header']
+    header['content_hash'] = f"{header['base_hash']}+{last['seq']}-{last['content_hash'][:16]}"
+    header['n_destinations'] = n_base - len(removed) + len(delta['names'])
+    header['delta_segments'] = len(segments)
+
+    return dict(
+        model_data,
+        header=header,
+        features=RowStack(model_data['features'], delta['features']),
+        labels=RowStack(model_data['labels'], delta['labels']),
+        display=RowStack(model_data['display'], delta['display']),
+        destinations=model_data['destinations'] + delta['names'],
+        index=DeltaIndex(model_data['index'], n_base, removed, delta['features']),
+        # Precomputed answers and the similarity graph describe the base only
+        answer_table=None,
+        similarity=None,
+        hidden_rows=removed,
+        attribute_index=DeltaAttributeIndex(base_attributes, n_base, removed, delta['labels'], delta['display']),
+        deltas={"segments": len(segments), "hidden_base_rows": int(len(removed)), "delta_rows": len(delta['names'])}
+    )
+
+def write_segment(artifact_dir, features, names, removed=()):
+    """Append one delta segment of upserted rows and removed names; returns the manifest entry"""
+    with update_lock(artifact_dir):
+        header = read_header(artifact_dir)
+        manifest = read_manifest(artifact_dir)
+        if manifest is None or manifest['base_hash'] != header['content_hash']:
+            shutil.rmtree(delta_dir(artifact_dir), ignore_errors=True)
+            os.makedirs(delta_dir(artifact_dir))
+            manifest = {"base_hash": header['content_hash'], "next_seq": 1, "segments": []}
+
+        seq = manifest['next_seq']
+        name = f"segment-{seq:06d}"
+        write_artifact(os.path.join(delta_dir(artifact_dir), name), features, names,
+                       header['weather_map'], header['activity_map'], {"seq": seq, "removed": sorted(set(removed))})
+        manifest['segments'].append(name)
+        manifest['next_seq'] = seq + 1
+        write_manifest(artifact_dir, manifest)
+    log_info("Delta segment written", {"segment": name, "upserts": len(names), "removes": len(set(removed))})
+    return {"segment": name, "segments": len(manifest['segments'])}
+
+def upsert_destinations(artifact_dir, records):
+    """Add or replace destinations given as catalogue records (name, budget, weather, activity, scores)"""
+    import pandas as pd
+    from ingest import encode_chunk
+
+    header = read_header(artifact_dir)
+    features, names, rejected = encode_chunk(pd.DataFrame(list(records)), header['weather_map'], header['activity_map'])
+    if len(set(names)) != len(names):
+        raise ValueError("Each destination may appear only once per update")
+    result = write_segment(artifact_dir, features, names)
+    result.update(upserted=len(names), rejected=rejected)
+    return result
+
+def remove_destinations(artifact_dir, names):
+    """Hide destinations by name until the next compaction drops them"""
+    header = read_header(artifact_dir)
+    result = write_segment(artifact_dir, np.empty((0, header['n_features']), dtype=np.float32), [], names)
+    result.update(removed=len(set(names)))
+    return result
+
+def needs_compaction(artifact_dir):
+    manifest = read_manifest(artifact_dir)
+    if not manifest or not manifest['segments']:
+        return False
+    if len(manifest['segments']) >= COMPACT_SEGMENTS:
+        return True
+    base = open_artifact(artifact_dir)
+    removed, delta = resolve_segments(base['destinations'], live_segments(artifact_dir, base['header']))
+    return len(removed) + len(delta['names']) >= COMPACT_FRACTION * max(len(base['features']), 1)
+
+def start_compaction(artifact_dir):
+    """Run compaction in a detached process so the caller returns immediately"""
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__), '--artifact', artifact_dir, 'compact'],
+                            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, start_new_session=True).pid
+
+def compact(artifact_dir, chunk_rows=1 << 16):
+    """Fold the deltas into a new base artifact with rebuilt derived files, then swap it in atomically
+
+    The new base holds the surviving base rows in order followed by the live
+    delta rows. It is written and indexed beside the artifact, so readers see
+    either the old base with its deltas or the finished new base.
+    """
+    from train_model import build_derived
+
+    artifact_dir = os.path.abspath(artifact_dir)
+    with update_lock(artifact_dir):
+        base = open_artifact(artifact_dir)
+        segments = live_segments(artifact_dir, base['header'])
+        if not segments:
+            return None
+        removed, delta = resolve_segments(base['destinations'], segments)
+        header = base['header']
+        extra_header = {k: v for k, v in header.items()
+                        if k not in ('schema_version', 'n_destinations', 'n_features',
+                                     'weather_map', 'activity_map', 'content_hash')}
+
+        staging = tempfile.mkdtemp(prefix='.model-compact-', dir=os.path.dirname(artifact_dir))
+        try:
+            out_dir = os.path.join(staging, 'model')
+            n_base = len(base['features'])
+            builder = ArtifactBuilder(out_dir, n_base - len(removed) + len(delta['names']),
+                                      header['weather_map'], header['activity_map'], header['n_features'])
+            try:
+                hidden = np.zeros(n_base, dtype=bool)
+                hidden[removed] = True
+                for start in range(0, n_base, chunk_rows):
+                    keep = np.flatnonzero(~hidden[start:start + chunk_rows]) + start
+                    builder.append(base['features'][keep], [base['destinations'][i] for i in keep.tolist()])
+                builder.append(delta['features'], delta['names'])
+            except Exception:
+                builder.abort()
+                raise
+            new_header = builder.close(extra_header)
+            build_derived(out_dir)
+            commit_dir(out_dir, artifact_dir)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    stats = {"segments": len(segments), "hidden_base_rows": int(len(removed)), "delta_rows": len(delta['names']),
+             "destinations": new_header['n_destinations'], "content_hash": new_header['content_hash']}
+    log_info("Deltas compacted", stats)
+    return stats
+
+def delta_status(artifact_dir):
+    base = open_artifact(artifact_dir)
+    segments = live_segments(artifact_dir, base['header'])
+    removed, delta = resolve_segments(base['destinations'], segments)
+    return {"base_destinations": len(base['features']), "segments": len(segments),
+            "hidden_base_rows": int(len(removed)), "delta_rows": len(delta['names']),
+            "needs_compaction": needs_compaction(artifact_dir)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental destination updates on a model artifact")
+    parser.add_argument('--artifact', default='model', help="Artifact directory (default: ./model)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    upsert = commands.add_parser('upsert', help="Add or replace destinations from a CSV, JSONL or Parquet file")
+    upsert.add_argument('catalogue')
+    remove = commands.add_parser('remove', help="Remove destinations by name")
+    remove.add_argument('names', nargs='+')
+    for command in (upsert, remove):
+        command.add_argument('--no-compact', action='store_true',
+                             help="Never start a background compaction after this update")
+    commands.add_parser('compact', help="Fold all deltas into the base artifact now")
+    commands.add_parser('status', help="Describe the pending deltas")
+    args = parser.parse_args()
+
+    if args.command == 'upsert':
+        from ingest import read_chunks
+        records = [record for chunk in read_chunks(args.catalogue) for record in chunk.to_dict('records')]
+        result = upsert_destinations(args.artifact, records)
+    elif args.command == 'remove':
+        result = remove_destinations(args.artifact, args.names)
+    elif args.command == 'compact':
+        result = compact(args.artifact) or {"segments": 0}
+    else:
+        result = delta_status(args.artifact)
+
+    if args.command in ('upsert', 'remove') and not args.no_compact and needs_compaction(args.artifact):
+        result["compaction_pid"] = start_compaction(args.artifact)
+    print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import os
+import json
+import numpy as np
+
+ATTRIBUTES_FILE = 'attributes.json'
+ATTRIBUTE_ARRAYS = ['budget_sorted', 'budget_order', 'safety_sorted', 'safety_order',
+                    'weather_bits', 'activity_bits']
+
+# Query feature columns each weight applies to
+WEIGHT_GROUPS = {
+    'budget': [0],
+    'weather': [1],
+    'activity': [2, 3, 4, 5, 6],
+    'safety': [7],
+    'popularity': [8],
+    'language': [9],
+    'cuisine': [10],
+    'nightlife': [11]
+}
+PROFILE_FIELDS = ['safety', 'popularity', 'language', 'cuisine', 'nightlife']
+
+def label_bitsets(codes, n_labels):
+    """One packed membership bitset per label value, shape (n_labels, ceil(N / 8))"""
+    return np.stack([np.packbits(codes == label) for label in range(n_labels)])
+
+def test_bits(bits, rows):
+    """Membership of each row in a packed bitset"""
+    return ((bits[rows >> 3] >> (7 - (rows & 7))) & 1).astype(bool)
+
+class AttributeIndex:
+    """Per-attribute lookup structures used to pre-filter destinations before distance search
+
+    Budget and safety are kept as sorted value arrays with the row order that
+    produced them, so a range constraint is two binary searches; weather and
+    activity are packed bitsets per label, so an allowed set is a bitwise OR.
+    """
+
+    def __init__(self, arrays, display):
+        for name in ATTRIBUTE_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.display = display
+        self.n = len(display)
+        self.weather_counts = np.array([int(np.unpackbits(b)[:self.n].sum()) for b in self.weather_bits])
+        self.activity_counts = np.array([int(np.unpackbits(b)[:self.n].sum()) for b in self.activity_bits])
+
+    @classmethod
+    def build(cls, model_data):
+        display = model_data['display']
+        labels = np.asarray(model_data['labels'])
+        budget_order = np.argsort(display[:, 0], kind='stable')
+        safety_order = np.argsort(display[:, 1], kind='stable')
+        arrays = {
+            'budget_order': budget_order,
+            'budget_sorted': np.asarray(display[:, 0])[budget_order],
+            'safety_order': safety_order,
+            'safety_sorted': np.asarray(display[:, 1])[safety_order],
+            'weather_bits': label_bitsets(labels[:, 0], len(model_data['weather_map'])),
+            'activity_bits': label_bitsets(labels[:, 1], len(model_data['activity_map']))
+        }
+        return cls(arrays, display)
+
+    def save(self, artifact_dir, content_hash):
+        """Store the index inside the artifact, stamped with its content hash"""
+        for name in ATTRIBUTE_ARRAYS:
+            np.save(os.path.join(artifact_dir, f'attr_{name}.npy'), getattr(self, name))
+        tmp_path = os.path.join(artifact_dir, ATTRIBUTES_FILE + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"content_hash": content_hash}, f)
+        os.replace(tmp_path, os.path.join(artifact_dir, ATTRIBUTES_FILE))
+
+    @classmethod
+    def load(cls, artifact_dir, model_data):
+        """Map the stored index, or return None if it is missing or stale"""
+        path = os.path.join(artifact_dir, ATTRIBUTES_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('content_hash') != model_data['header']['content_hash']:
+            return None
+        arrays = {name: np.load(os.path.join(artifact_dir, f'attr_{name}.npy'), mmap_mode='r')
+                  for name in ATTRIBUTE_ARRAYS}
+        return cls(arrays, model_data['display'])
+
+    def candidate_rows(self, constraints):
+        """Ascending row numbers satisfying every constraint
+
+        The most selective constraint enumerates candidates; the rest are
+        checked only on those rows, so cost follows the result size rather
+        than the catalogue size.
+        """
+        plans = []
+        min_budget = constraints.get('min_budget')
+        max_budget = constraints.get('max_budget')
+        if min_budget is not None or max_budget is not None:
+            lo = 0 if min_budget is None else int(np.searchsorted(self.budget_sorted, min_budget, 'left'))
+            hi = self.n if max_budget is None else int(np.searchsorted(self.budget_sorted, max_budget, 'right'))
+            plans.append((max(hi - lo, 0), 'budget', (lo, hi)))
+        min_safety = constraints.get('min_safety')
+        if min_safety is not None:
+            lo = int(np.searchsorted(self.safety_sorted, min_safety, 'left'))
+            plans.append((self.n - lo, 'safety', lo))
+        weathers = constraints.get('weathers')
+        if weathers is not None:
+            plans.append((int(self.weather_counts[weathers].sum()), 'weather', weathers))
+        activities = constraints.get('activities')
+        if activities is not None:
+            plans.append((int(self.activity_counts[activities].sum()), 'activity', activities))
+
+        if not plans:
+            return np.arange(self.n)
+
+        plans.sort(key=lambda plan: plan[0])
+        _, kind, arg = plans[0]
+        if kind == 'budget':
+            rows = np.asarray(self.budget_order[arg[0]:arg[1]])
+        elif kind == 'safety':
+            rows = np.asarray(self.safety_order[arg:])
+        else:
+            bits = np.bitwise_or.reduce(np.asarray(getattr(self, f'{kind}_bits'))[arg], axis=0)
+            rows = np.flatnonzero(np.unpackbits(bits)[:self.n])
+
+        keep = np.ones(len(rows), dtype=bool)
+        for _, kind, arg in plans[1:]:
+            if kind == 'budget':
+                budgets = self.display[rows, 0]
+                if min_budget is not None:
+                    keep &= budgets >= min_budget
+                if max_budget is not None:
+                    keep &= budgets <= max_budget
+            elif kind == 'safety':
+                keep &= self.display[rows, 1] >= min_safety
+            else:
+                bits = np.bitwise_or.reduce(np.asarray(getattr(self, f'{kind}_bits'))[arg], axis=0)
+                keep &= test_bits(bits, rows)
+        return np.sort(rows[keep])
+
+def attribute_index(model_data):
+    """The model's attribute index, loaded from the artifact or built on first use"""
+    index = model_data.get('attribute_index')
+    if index is None:
+        artifact_dir = model_data.get('artifact_dir')
+        index = AttributeIndex.load(artifact_dir, model_data) if artifact_dir else None
+        if index is None:
+            index = AttributeIndex.build(model_data)
+        model_data['attribute_index'] = index
+    return index
+
+def parse_weights(weights):
+    """12-element weight vector from {'budget': w, 'activity': w, ...}; None means unweighted"""
+    if not weights:
+        return None
+    if not isinstance(weights, dict):
+        raise ValueError("weights must be an object of feature weights")
+    vector = np.ones(12)
+    for name, value in weights.items():
+        if name not in WEIGHT_GROUPS:
+            raise ValueError(f"Unknown weight '{name}'. Must be one of: {', '.join(WEIGHT_GROUPS)}")
+        value = float(value)
+        if not value >= 0:
+            raise ValueError("weights must not be negative")
+        vector[WEIGHT_GROUPS[name]] = value
+    return vector
+
+def parse_profile(profile):
+    """Target values for the five profile scores, as percentages like the response; None keeps defaults"""
+    if not profile:
+        return None
+    if not isinstance(profile, dict):
+        raise ValueError("profile must be an object of target scores")
+    targets = {}
+    for name, value in profile.items():
+        if name not in PROFILE_FIELDS:
+            raise ValueError(f"Unknown profile field '{name}'. Must be one of: {', '.join(PROFILE_FIELDS)}")
+        value = float(value)
+        if not 0 <= value <= 100:
+            raise ValueError("profile scores must be between 0 and 100")
+        targets[name] = value / 100
+    return targets
+
+def parse_constraints(params, weather_map, activity_map):
+    """Hard constraints from request params, in response units (dollars, percent); None if unconstrained
+
+    Supported keys: min_budget, max_budget, min_safety, weathers, activities.
+    """
+    constraints = {}
+    for key in ('min_budget', 'max_budget', 'min_safety'):
+        if params.get(key) is not None:
+            constraints[key] = float(params[key])
+    for key, mapping in (('weathers', weather_map), ('activities', activity_map)):
+        allowed = params.get(key)
+        if allowed is None:
+            continue
+        if isinstance(allowed, str):
+            allowed = [allowed]
+        labels = list(mapping.keys())
+        codes = []
+        for label in allowed:
+            label = str(label).lower()
+            if label not in mapping:
+                raise ValueError(f"Invalid {key} value '{label}'. Must be one of: {', '.join(labels)}")
+            codes.append(labels.index(label))
+        constraints[key] = sorted(set(codes))
+    return constraints or None
+
+FILTER_KEYS = ['weights', 'profile', 'min_budget', 'max_budget', 'min_safety', 'weathers', 'activities']
+
+def search_options(filters, weather_map, activity_map):
+    """Parse request filters into {'weights', 'profile', 'constraints'}; None for a plain query"""
+    if not filters:
+        return None
+    options = {
+        'weights': parse_weights(filters.get('weights')),
+        'profile': parse_profile(filters.get('profile')),
+        'constraints': parse_constraints(filters, weather_map, activity_map)
+    }
+    if all(value is None for value in options.values()):
+        return None
+    return options
+
+def options_key(options):
+    """Hashable form of parsed search options, for caches"""
+    if options is None:
+        return None
+    weights = options['weights']
+    profile = options['profile']
+    constraints = options['constraints']
+    return (
+        None if weights is None else tuple(weights.tolist()),
+        None if profile is None else tuple(sorted(profile.items())),
+        None if constraints is None else tuple(sorted(
+            (key, tuple(value) if isinstance(value, list) else value) for key, value in constraints.items()))
+    )
@@ -0,0 +1,283 @@
+import os
+import json
+import numpy as np
+
+INDEX_FILE = 'index.json'
+SEARCH_BLOCK_ELEMENTS = 1 << 22
+QUERY_BLOCK = 64
+ROW_BLOCK = 1 << 16
+AUTO_IVF_MIN_ROWS = 100000
+DEFAULT_NPROBE = 16
+
+def exact_distances(features, queries, rows):
+    """Euclidean distances from each query to its own candidate rows, shape (n_queries, n_rows)"""
+    diff = queries[:, None, :] - np.asarray(features[rows.ravel()], dtype=float).reshape(rows.shape + (-1,))
+    return np.sqrt(np.einsum('qnf,qnf->qn', diff, diff))
+
+def order_candidates(distances, rows, k):
+    """Keep the k nearest candidates per query, nearest first with ties broken by row"""
+    if distances.shape[1] > k:
+        keep = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        distances = np.take_along_axis(distances, keep, axis=1)
+        rows = np.take_along_axis(rows, keep, axis=1)
+    order = np.lexsort((rows, distances), axis=1)
+    return np.take_along_axis(distances, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+def select_topk(distances, k):
+    """k smallest entries per row, nearest first, ties resolved to the lower column
+
+    argpartition finds the k-th distance in linear time; only the k winners
+    are sorted, so this matches a full stable argsort without its N log N cost.
+    """
+    n = distances.shape[1]
+    if k >= n:
+        order = np.argsort(distances, axis=1, kind='stable')
+        return np.take_along_axis(distances, order, axis=1), order
+    kth = np.partition(distances, k - 1, axis=1)[:, k - 1:k]
+    below = distances < kth
+    ties = distances == kth
+    needed = k - below.sum(axis=1, keepdims=True)
+    chosen = below | (ties & (np.cumsum(ties, axis=1) <= needed))
+    columns = np.nonzero(chosen)[1].reshape(len(distances), k)
+    chosen_distances = np.take_along_axis(distances, columns, axis=1)
+    order = np.argsort(chosen_distances, axis=1, kind='stable')
+    return np.take_along_axis(chosen_distances, order, axis=1), np.take_along_axis(columns, order, axis=1)
+
+def search_rows(features, queries, k, rows=None, weights=None):
+    """Exact k nearest among the given ascending rows (all rows if None), optionally feature-weighted
+
+    Weighted distance is sqrt(sum(w * diff^2)). Cost is proportional to the
+    number of rows searched, so a selective pre-filter keeps queries cheap on
+    any catalogue size. Ties resolve to the lower row like select_topk.
+    """
+    queries = np.asarray(queries, dtype=float)
+    n_rows = len(features) if rows is None else len(rows)
+    k = min(k, n_rows)
+    scale = None if weights is None else np.sqrt(np.asarray(weights, dtype=float))
+    if scale is not None:
+        queries = queries * scale
+
+    best_d = np.empty((len(queries), 0))
+    best_i = np.empty((len(queries), 0), dtype=np.int64)
+    block = max(1, SEARCH_BLOCK_ELEMENTS // (max(len(queries), 1) * features.shape[1]))
+    for start in range(0, n_rows, block):
+        if rows is None:
+            ids = np.arange(start, min(start + block, n_rows))
+            candidates = np.asarray(features[start:start + block], dtype=float)
+        else:
+            ids = np.asarray(rows[start:start + block], dtype=np.int64)
+            candidates = np.asarray(features[ids], dtype=float)
+        if scale is not None:
+            candidates = candidates * scale
+        diff = queries[:, None, :] - candidates[None, :, :]
+        cand_d = np.concatenate([best_d, np.sqrt(np.einsum('qnf,qnf->qn', diff, diff))], axis=1)
+        cand_i = np.concatenate([best_i, np.broadcast_to(ids, (len(queries), len(ids)))], axis=1)
+        best_d, columns = select_topk(cand_d, k)
+        best_i = np.take_along_axis(cand_i, columns, axis=1)
+    return best_d, best_i
+
+class BruteForceIndex:
+    """Exact search over every row of the feature matrix"""
+
+    kind = 'brute'
+
+    def __init__(self, features, block_elements=SEARCH_BLOCK_ELEMENTS):
+        self.features = features
+        self.block_elements = block_elements
+        self._norms = None
+
+    def __len__(self):
+        return len(self.features)
+
+    def search(self, queries, k):
+        """Return (distances, indices) of the k nearest rows for each query, nearest first"""
+        queries = np.asarray(queries, dtype=float)
+        k = min(k, len(self.features))
+        if len(self.features) * self.features.shape[1] <= self.block_elements:
+            return self._search_small(queries, k)
+        return self._search_blocked(queries, k)
+
+    def _search_small(self, queries, k):
+        n = len(queries)
+        distances = np.empty((n, k))
+        indices = np.empty((n, k), dtype=np.int64)
+        block = max(1, self.block_elements // (len(self.features) * self.features.shape[1]))
+        for start in range(0, n, block):
+            diff = queries[start:start + block, None, :] - self.features[None, :, :]
+            block_distances = np.sqrt(np.einsum('qnf,qnf->qn', diff, diff))
+            distances[start:start + block], indices[start:start + block] = select_topk(block_distances, k)
+        return distances, indices
+
+    def _row_norms(self):
+        if self._norms is None:
+            norms = np.empty(len(self.features), dtype=np.float32)
+            for start in range(0, len(self.features), ROW_BLOCK):
+                rows = np.asarray(self.features[start:start + ROW_BLOCK], dtype=np.float32)
+                norms[start:start + len(rows)] = np.einsum('nf,nf->n', rows, rows)
+            self._norms = norms
+        return self._norms
+
+    def _search_blocked(self, queries, k):
+        # Rank with the ||x||^2 - 2 q.x expansion in float32, then rescore the winners exactly
+        norms = self._row_norms()
+        n = len(queries)
+        distances = np.empty((n, k))
+        indices = np.empty((n, k), dtype=np.int64)
+        for q_start in range(0, n, QUERY_BLOCK):
+            q = queries[q_start:q_start + QUERY_BLOCK]
+            q32 = q.astype(np.float32)
+            best_d = np.full((len(q), 0), np.inf, dtype=np.float32)
+            best_i = np.empty((len(q), 0), dtype=np.int64)
+            for r_start in range(0, len(self.features), ROW_BLOCK):
+                rows = np.asarray(self.features[r_start:r_start + ROW_BLOCK], dtype=np.float32)
+                partial = norms[r_start:r_start + len(rows)] - 2 * (q32 @ rows.T)
+                cand_d = np.concatenate([best_d, partial], axis=1)
+                cand_i = np.concatenate([best_i, np.broadcast_to(
+                    np.arange(r_start, r_start + len(rows)), partial.shape)], axis=1)
+                if cand_d.shape[1] > k:
+                    keep = np.argpartition(cand_d, k - 1, axis=1)[:, :k]
+                    cand_d = np.take_along_axis(cand_d, keep, axis=1)
+                    cand_i = np.take_along_axis(cand_i, keep, axis=1)
+                best_d, best_i = cand_d, cand_i
+            exact = exact_distances(self.features, q, best_i)
+            distances[q_start:q_start + len(q)], indices[q_start:q_start + len(q)] = \
+                order_candidates(exact, best_i, k)
+        return distances, indices
+
+def kmeans(data, n_clusters, n_iter=10, seed=0):
+    """Plain Lloyd's k-means in float32; returns the centroid matrix"""
+    rng = np.random.default_rng(seed)
+    data = np.asarray(data, dtype=np.float32)
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = assign_clusters(data, centroids)
+        counts = np.bincount(labels, minlength=n_clusters)
+        sums = np.stack([np.bincount(labels, weights=data[:, f], minlength=n_clusters)
+                         for f in range(data.shape[1])], axis=1).astype(np.float32)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+    return centroids
+
+def assign_clusters(data, centroids):
+    """Nearest centroid for every row, computed in row blocks"""
+    centroid_norms = np.einsum('cf,cf->c', centroids, centroids)
+    labels = np.empty(len(data), dtype=np.int64)
+    block = max(1, SEARCH_BLOCK_ELEMENTS // len(centroids))
+    for start in range(0, len(data), block):
+        rows = np.asarray(data[start:start + block], dtype=np.float32)
+        labels[start:start + len(rows)] = np.argmin(centroid_norms - 2 * (rows @ centroids.T), axis=1)
+    return labels
+
+class IVFIndex:
+    """Inverted-file index: rows bucketed by k-means cell, only the nprobe closest cells are scanned"""
+
+    kind = 'ivf'
+
+    def __init__(self, centroids, offsets, ids, vectors, nprobe=DEFAULT_NPROBE):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+        self.vectors = vectors
+        self.nprobe = nprobe
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, features, n_lists=None, nprobe=DEFAULT_NPROBE, n_iter=10, sample_size=None, seed=0):
+        """Cluster the catalogue into n_lists cells (default 4 * sqrt(N)) and bucket every row"""
+        n = len(features)
+        n_lists = min(n, n_lists or max(1, int(4 * np.sqrt(n))))
+        sample_size = min(n, sample_size or 64 * n_lists)
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(features[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+        centroids = kmeans(sample, n_lists, n_iter=n_iter, seed=seed)
+
+        labels = assign_clusters(features, centroids)
+        ids = np.argsort(labels, kind='stable')
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=offsets[1:])
+        vectors = np.asarray(features, dtype=np.float32)[ids]
+        return cls(centroids, offsets, ids, vectors, nprobe)
+
+    def search(self, queries, k, nprobe=None):
+        """Approximate k nearest rows per query; larger nprobe trades latency for recall"""
+        queries = np.asarray(queries, dtype=float)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        k = min(k, len(self.ids))
+        sizes = np.diff(self.offsets)
+        centroid_distances = (np.einsum('cf,cf->c', self.centroids, self.centroids)
+                              - 2 * (queries.astype(np.float32) @ self.centroids.T))
+        probe_order = np.argsort(centroid_distances, axis=1)
+
+        distances = np.empty((len(queries), k))
+        indices = np.empty((len(queries), k), dtype=np.int64)
+        for qi, query in enumerate(queries):
+            # Probe at least nprobe cells, and enough cells to hold k candidates
+            covered = np.cumsum(sizes[probe_order[qi]])
+            n_cells = max(nprobe, int(np.searchsorted(covered, k)) + 1)
+            cells = probe_order[qi, :n_cells]
+            slots = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in cells])
+            diff = self.vectors[slots] - query
+            cand_d = np.sqrt(np.einsum('nf,nf->n', diff, diff))[None, :]
+            cand_i = self.ids[slots][None, :]
+            distances[qi], indices[qi] = (a[0] for a in order_candidates(cand_d, cand_i, k))
+        return distances, indices
+
+    def save(self, artifact_dir, content_hash):
+        """Store the index files inside the artifact, stamped with its content hash"""
+        np.save(os.path.join(artifact_dir, 'ivf_centroids.npy'), self.centroids)
+        np.save(os.path.join(artifact_dir, 'ivf_offsets.npy'), self.offsets)
+        np.save(os.path.join(artifact_dir, 'ivf_ids.npy'), self.ids)
+        np.save(os.path.join(artifact_dir, 'ivf_vectors.npy'), self.vectors)
+        write_index_meta(artifact_dir, {
+            "kind": self.kind,
+            "n_lists": int(len(self.centroids)),
+            "nprobe": int(self.nprobe),
+            "content_hash": content_hash
+        })
+
+    @classmethod
+    def load(cls, artifact_dir, meta):
+        return cls(
+            np.load(os.path.join(artifact_dir, 'ivf_centroids.npy')),
+            np.load(os.path.join(artifact_dir, 'ivf_offsets.npy')),
+            np.load(os.path.join(artifact_dir, 'ivf_ids.npy'), mmap_mode='r'),
+            np.load(os.path.join(artifact_dir, 'ivf_vectors.npy'), mmap_mode='r'),
+            meta.get('nprobe', DEFAULT_NPROBE)
+        )
+
+def write_index_meta(artifact_dir, meta):
+    tmp_path = os.path.join(artifact_dir, INDEX_FILE + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(artifact_dir, INDEX_FILE))
+
+def build_index(features, kind='auto', **params):
+    """Build a search index; 'auto' picks IVF for catalogues of AUTO_IVF_MIN_ROWS rows or more"""
+    if kind == 'auto':
+        kind = 'ivf' if len(features) >= AUTO_IVF_MIN_ROWS else 'brute'
+    if kind == 'brute':
+        return BruteForceIndex(features)
+    if kind == 'ivf':
+        return IVFIndex.build(features, **params)
+    raise ValueError(f"Unknown index kind: {kind}")
+
+def save_index(index, artifact_dir, content_hash):
+    """Persist index into the artifact; brute force only records its kind"""
+    if isinstance(index, IVFIndex):
+        index.save(artifact_dir, content_hash)
+    else:
+        write_index_meta(artifact_dir, {"kind": index.kind, "content_hash": content_hash})
+
+def load_index(artifact_dir, model_data):
+    """Open the artifact's stored index, falling back to brute force if none matches the artifact"""
+    path = os.path.join(artifact_dir, INDEX_FILE)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('content_hash') == model_data['header']['content_hash'] and meta.get('kind') == 'ivf':
+            return IVFIndex.load(artifact_dir, meta)
+    return BruteForceIndex(model_data['features'])
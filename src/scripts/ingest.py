@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+from deltas import compact, live_segments, update_lock
+from model_store import ArtifactBuilder, open_artifact, NAMES_FILE, NAME_OFFSETS_FILE, BUDGET_SCALE
+from telemetry import log_info
+
+SCORE_COLUMNS = ['safety', 'popularity', 'language', 'cuisine', 'nightlife']
+REQUIRED_COLUMNS = ['name', 'budget', 'weather', 'activity'] + SCORE_COLUMNS
+DEFAULT_CHUNK_ROWS = 100000
+
+def source_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.csv', '.tsv'):
+        return 'csv'
+    if ext in ('.parquet', '.pq'):
+        return 'parquet'
+    if ext in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    raise ValueError(f"Unsupported catalogue format: {ext or path}")
+
+def count_rows(path):
+    """Cheap upper bound on the number of rows in a catalogue file, used to preallocate"""
+    fmt = source_format(path)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+
+    lines = 0
+    last = b'\n'
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        lines += 1
+    return max(lines - 1, 0) if fmt == 'csv' else lines
+
+def read_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield DataFrames of at most chunk_rows catalogue rows"""
+    fmt = source_format(path)
+    if fmt == 'csv':
+        yield from pd.read_csv(path, chunksize=chunk_rows, sep='\t' if path.endswith('.tsv') else ',')
+    elif fmt == 'jsonl':
+        yield from pd.read_json(path, lines=True, chunksize=chunk_rows)
+    else:
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Reading Parquet catalogues requires pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=REQUIRED_COLUMNS):
+            yield batch.to_pandas()
+
+def category_codes(values, categories):
+    """Position of each stripped, lower-cased value in categories, -1 for values not among them"""
+    return pd.Index(categories).get_indexer(values.astype(str).str.strip().str.lower())
+
+def encode_chunk(chunk, weather_map, activity_map):
+    """Validate one chunk and encode it; returns (features, names, rejected counts by reason)"""
+    missing = [c for c in REQUIRED_COLUMNS if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"Catalogue is missing columns: {', '.join(missing)}")
+
+    names = chunk['name']
+    budget = pd.to_numeric(chunk['budget'], errors='coerce').to_numpy(dtype=float)
+    weather = category_codes(chunk['weather'], list(weather_map.keys()))
+    activity = category_codes(chunk['activity'], list(activity_map.keys()))
+    scores = np.column_stack([pd.to_numeric(chunk[c], errors='coerce').to_numpy(dtype=float)
+                              for c in SCORE_COLUMNS])
+
+    checks = {
+        "missing_name": names.isna().to_numpy() | (names.astype(str).str.strip() == '').to_numpy(),
+        "invalid_budget": ~(budget >= 0),
+        "unknown_weather": weather < 0,
+        "unknown_activity": activity < 0,
+        "invalid_score": ~((scores >= 0) & (scores <= 1)).all(axis=1)
+    }
+    rejected = np.zeros(len(chunk), dtype=bool)
+    for mask in checks.values():
+        rejected |= mask
+    keep = ~rejected
+
+    weather_values = np.array(list(weather_map.values()), dtype=np.float32)
+    activity_values = np.array(list(activity_map.values()), dtype=np.float32)
+    features = np.empty((int(keep.sum()), 12), dtype=np.float32)
+    features[:, 0] = budget[keep] / BUDGET_SCALE
+    features[:, 1] = weather_values[weather[keep]]
+    features[:, 2:7] = activity_values[activity[keep]]
+    features[:, 7:] = scores[keep]
+
+    return features, names[keep].astype(str).tolist(), {k: int(v.sum()) for k, v in checks.items() if v.any()}
+
+def ingest(path, builder, weather_map, activity_map, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Stream a catalogue file into an ArtifactBuilder and return ingestion stats"""
+    stats = {"source": path, "rows_read": 0, "rows_written": 0, "rejected": {}}
+    start = time.perf_counter()
+    for chunk in read_chunks(path, chunk_rows):
+        features, names, rejected = encode_chunk(chunk, weather_map, activity_map)
+        builder.append(features, names)
+        stats["rows_read"] += len(chunk)
+        stats["rows_written"] += len(names)
+        for reason, count in rejected.items():
+            stats["rejected"][reason] = stats["rejected"].get(reason, 0) + count
+        log_info("Ingested chunk", {"rows_read": stats["rows_read"], "rows_written": stats["rows_written"]})
+    elapsed = time.perf_counter() - start
+    stats["seconds"] = round(elapsed, 3)
+    stats["rows_per_second"] = round(stats["rows_read"] / elapsed, 1) if elapsed > 0 else None
+    return stats
+
+def build_from_catalogue(path, out_dir, weather_map, activity_map, chunk_rows=DEFAULT_CHUNK_ROWS, extra_header=None):
+    """Create a fresh artifact from a catalogue export; returns (header, stats)"""
+    builder = ArtifactBuilder(out_dir, count_rows(path), weather_map, activity_map)
+    try:
+        stats = ingest(path, builder, weather_map, activity_map, chunk_rows)
+    except Exception:
+        builder.abort()
+        raise
+    return builder.close(extra_header), stats
+
+def append_catalogue(path, artifact_dir, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Add the destinations in path to an existing artifact without re-encoding its rows
+
+    The artifact is rebuilt from its base rows, so it must have no pending
+    delta segments; callers hold update_lock so none can be written meanwhile.
+    """
+    base = open_artifact(artifact_dir)
+    header = base['header']
+    if live_segments(artifact_dir, header):
+        raise ValueError("Artifact has pending delta segments; compact them before appending")
+    weather_map, activity_map = header['weather_map'], header['activity_map']
+    extra_header = {k: v for k, v in header.items()
+                    if k not in ('schema_version', 'n_destinations', 'n_features',
+                                 'weather_map', 'activity_map', 'content_hash')}
+
+    builder = ArtifactBuilder(artifact_dir, len(base['features']) + count_rows(path), weather_map, activity_map)
+    try:
+        offsets = np.load(os.path.join(artifact_dir, NAME_OFFSETS_FILE))
+        names_blob = np.memmap(os.path.join(artifact_dir, NAMES_FILE), dtype=np.uint8, mode='r') \
+            if offsets[-1] > 0 else b''
+        for start in range(0, len(base['features']), chunk_rows):
+            stop = min(start + chunk_rows, len(base['features']))
+            builder.append_blob(base['features'][start:stop], names_blob, offsets[start:stop + 1])
+        del names_blob
+        stats = ingest(path, builder, weather_map, activity_map, chunk_rows)
+    except Exception:
+        builder.abort()
+        raise
+    base = None
+    stats["rows_kept"] = int(header['n_destinations'])
+    return builder.close(extra_header), stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or extend a model artifact from a catalogue export")
+    parser.add_argument('catalogue', help="CSV, JSONL or Parquet file with name, budget, weather, activity and score columns")
+    parser.add_argument('--artifact', default='model', help="Artifact directory (default: ./model)")
+    parser.add_argument('--append', action='store_true', help="Add rows to the existing artifact instead of replacing it")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--no-derived', action='store_true', help="Skip rebuilding the search index, answer table, attribute index and similarity graph")
+    args = parser.parse_args()
+
+    from train_model import WEATHER_MAP, ACTIVITY_MAP, build_derived
+    from recommend import N_NEIGHBORS
+
+    if args.append:
+        # Fold pending delta updates into the base first, or rebuilding it would drop them
+        compact(args.artifact)
+    with update_lock(args.artifact):
+        if args.append:
+            header, stats = append_catalogue(args.catalogue, args.artifact, args.chunk_rows)
+        else:
+            header, stats = build_from_catalogue(args.catalogue, args.artifact, WEATHER_MAP, ACTIVITY_MAP,
+                                                 args.chunk_rows, {"n_neighbors": N_NEIGHBORS})
+        if not args.no_derived:
+            build_derived(args.artifact)
+    stats["destinations"] = header['n_destinations']
+    print(json.dumps(stats))
+
+if __name__ == "__main__":
+    main()
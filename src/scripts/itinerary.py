@@ -0,0 +1,162 @@
+import numpy as np
+
+from suggest_activities import TIME_SLOTS, activity_index, get_destination_features, score_rows
+
+DEFAULT_DAY_HOURS = 10
+MAX_DAYS = 60
+MAX_CANDIDATES = 64
+BEAM_WIDTH = 8
+OPTIONS_PER_SLOT = 3
+
+def candidate_rows(index, activity_types):
+    """Activity rows of the requested types (all types if None)"""
+    types = list(index['types']) if activity_types is None else list(dict.fromkeys(activity_types))
+    unknown = [t for t in types if t not in index['types']]
+    if unknown:
+        raise ValueError(f"No activities found for type: {', '.join(unknown)}")
+    return np.concatenate([np.arange(index['offsets'][index['types'][t]], index['offsets'][index['types'][t] + 1])
+                           for t in types]) if types else np.empty(0, dtype=np.int64)
+
+def slot_options(rankings, available, per_slot):
+    """Candidate columns for each slot of each state's next day, shape (n_states, 3, per_slot + 3)
+
+    rankings holds, per slot, the activity columns by score and by value for
+    money. Each state gets its first per_slot unused activities by score and
+    first two by value; picks past the unused ones, and the last option, are
+    free time (column n).
+    """
+    n = available.shape[1]
+    ranked = available[:, rankings]
+    first = np.argsort(~ranked, axis=3, kind='stable')
+    options = []
+    for ranking, count in ((0, per_slot), (1, 2)):
+        picks = first[:, :, ranking, :count]
+        columns = np.broadcast_to(rankings[:, ranking], (len(available),) + rankings[:, ranking].shape)
+        columns = np.take_along_axis(columns, picks, axis=2)
+        columns[~np.take_along_axis(ranked[:, :, ranking], picks, axis=2)] = n
+        options.append(columns)
+    options.append(np.full((len(available), 3, 1), n))
+    return np.concatenate(options, axis=2)
+
+def beam_search(slot_scores, durations, costs, days, budget, max_hours, width, per_slot):
+    """Fill each day in turn, keeping the width best partial trips that fit the budget
+
+    Each state's next day is built from its own unused activities, so late
+    days are planned from what is left rather than from a fixed list of
+    favourites. Trips using the same activities are merged. Returns the
+    (morning, afternoon, evening) columns for every day.
+    """
+    n = slot_scores.shape[1]
+    # Column n is free time: no score, no hours, no cost
+    scores = np.concatenate([slot_scores, np.zeros((3, 1))], axis=1)
+    hours = np.append(durations, 0.0)
+    price = np.append(costs, 0.0)
+    bits = np.append(np.left_shift(np.uint64(1), np.arange(n, dtype=np.uint64)), np.uint64(0))
+    shifts = np.arange(n, dtype=np.uint64)
+    # Rank by score, and by value for money so tight budgets still have choices
+    rankings = np.stack([np.argsort(-slot_scores, axis=1, kind='stable'),
+                         np.argsort(-slot_scores / (costs + 1e-9), axis=1, kind='stable')], axis=1)
+    k = per_slot + 3
+    triples = np.stack(np.meshgrid(np.arange(k), np.arange(k), np.arange(k), indexing='ij'), axis=-1).reshape(-1, 3)
+
+    state_score = np.zeros(1)
+    state_cost = np.zeros(1)
+    state_mask = np.zeros(1, dtype=np.uint64)
+    parents, plans = [], []
+    for _ in range(days):
+        available = ((state_mask[:, None] >> shifts) & np.uint64(1)) == 0
+        if not available.any():
+            # Every activity is placed; the remaining days are free
+            parents.append(np.arange(len(state_mask)))
+            plans.append(np.full((len(state_mask), 3), n))
+            continue
+        options = slot_options(rankings, available, per_slot)
+        m = options[:, 0, triples[:, 0]]
+        a = options[:, 1, triples[:, 1]]
+        e = options[:, 2, triples[:, 2]]
+
+        distinct = ((m != a) | (m == n)) & ((m != e) | (m == n)) & ((a != e) | (a == n))
+        cost = state_cost[:, None] + (price[m] + price[a] + price[e])
+        ok = distinct & (hours[m] + hours[a] + hours[e] <= max_hours) & (cost <= budget + 1e-9)
+        score = np.where(ok, state_score[:, None] + (scores[0, m] + scores[1, a] + scores[2, e]), -np.inf).ravel()
+
+        candidates = np.flatnonzero(np.isfinite(score))
+        candidates = candidates[np.lexsort((candidates, -score[candidates]))]
+        m, a, e = m.ravel()[candidates], a.ravel()[candidates], e.ravel()[candidates]
+        parent = candidates // len(triples)
+        mask = state_mask[parent] | bits[m] | bits[a] | bits[e]
+        _, first = np.unique(mask, return_index=True)
+        keep = np.sort(first)[:width]
+
+        parents.append(parent[keep])
+        plans.append(np.stack([m[keep], a[keep], e[keep]], axis=1))
+        state_score = score[candidates[keep]]
+        state_cost = cost.ravel()[candidates[keep]]
+        state_mask = mask[keep]
+
+    # An all-free day is always feasible, so every day keeps at least one state
+    state = int(np.argmax(state_score))
+    chosen = []
+    for day in range(days - 1, -1, -1):
+        chosen.append(plans[day][state])
+        state = int(parents[day][state])
+    return chosen[::-1]
+
+def plan_itinerary(destination, weather, days, budget, activity_types=None, max_hours_per_day=DEFAULT_DAY_HOURS,
+                   beam_width=BEAM_WIDTH, per_slot=OPTIONS_PER_SLOT):
+    """Multi-day plan filling morning/afternoon/evening slots under total budget and daily hour limits
+
+    Activity costs follow suggest_activities with the budget spread over the
+    trip length instead of a fixed week; an activity is used at most once.
+    """
+    if not 1 <= days <= MAX_DAYS:
+        raise ValueError(f"days must be between 1 and {MAX_DAYS}")
+    if budget < 0:
+        raise ValueError("budget must not be negative")
+    if max_hours_per_day <= 0:
+        raise ValueError("max_hours_per_day must be positive")
+
+    index = activity_index
+    dest_features = get_destination_features(destination)
+    rows = candidate_rows(index, activity_types)
+    slot_scores = np.concatenate([score_rows(index, rows, weather, slot, [dest_features]) for slot in TIME_SLOTS])
+    if len(rows) > MAX_CANDIDATES:
+        # Used-activity bitmasks hold 64 activities; plan with the highest-scoring ones
+        keep = np.sort(np.argsort(-slot_scores.max(axis=0), kind='stable')[:MAX_CANDIDATES])
+        rows, slot_scores = rows[keep], slot_scores[:, keep]
+
+    daily_budget = budget / days
+    costs = daily_budget * index['cost_factor'][rows] * dest_features.get('cost_level', 1.0)
+    durations = index['duration'][rows]
+
+    chosen = beam_search(slot_scores, durations, costs, days, budget, max_hours_per_day, beam_width, per_slot)
+
+    itinerary = []
+    for day, plan in enumerate(chosen, start=1):
+        entries = []
+        for slot, column in enumerate(plan.tolist()):
+            if column == len(rows):
+                continue
+            record = index['records'][rows[column]]
+            entries.append({
+                'time_of_day': TIME_SLOTS[slot],
+                **record,
+                'destination_specific': f"{record['name']} in {destination}",
+                'score': float(slot_scores[slot, column]),
+                'estimated_cost': round(float(costs[column]), 2)
+            })
+        itinerary.append({
+            'day': day,
+            'activities': entries,
+            'hours': sum(entry['duration'] for entry in entries),
+            'cost': round(sum(float(costs[c]) for c in plan.tolist() if c < len(rows)), 2),
+            'score': round(sum(entry['score'] for entry in entries), 2)
+        })
+
+    return {
+        'destination': destination,
+        'days': itinerary,
+        'total_score': round(sum(day['score'] for day in itinerary), 2),
+        'total_cost': round(sum(day['cost'] for day in itinerary), 2),
+        'budget': budget
+    }
@@ -0,0 +1,272 @@
+import sys
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+
+SCHEMA_VERSION = 1
+HEADER_FILE = 'header.json'
+FEATURES_FILE = 'features.npy'
+NAMES_FILE = 'names.bin'
+NAME_OFFSETS_FILE = 'name_offsets.npy'
+LABELS_FILE = 'labels.npy'
+DISPLAY_FILE = 'display.npy'
+BUDGET_SCALE = 5000
+DECODE_BLOCK_ROWS = 1 << 16
+
+def encode_string_table(names):
+    """Pack names into one UTF-8 blob plus an (N + 1) offsets array"""
+    encoded = [name.encode('utf-8') for name in names]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return b''.join(encoded), offsets
+
+def decode_string_table(blob, offsets):
+    """Unpack a string table written by encode_string_table"""
+    blob = bytes(blob)
+    bounds = offsets.tolist()
+    return [blob[start:end].decode('utf-8') for start, end in zip(bounds[:-1], bounds[1:])]
+
+def decode_rows(features, weather_map, activity_map):
+    """Per-destination label indices (weather, activity) and response-ready display values
+
+    Display columns are the budget in dollars followed by the five profile
+    scores as percentages, rounded the way responses present them.
+    """
+    features = np.asarray(features, dtype=float)
+    weather_values = np.array(list(weather_map.values()), dtype=float)
+    weather_hits = np.abs(features[:, 1, None] - weather_values) < 0.2
+    activity_values = np.array(list(activity_map.values()), dtype=float)
+    activity_hits = (features[:, None, 2:7] == activity_values).all(axis=-1)
+    if not weather_hits.any(axis=1).all() or not activity_hits.any(axis=1).all():
+        raise ValueError("Destination features do not match the model label maps")
+
+    labels = np.stack([weather_hits.argmax(axis=1), activity_hits.argmax(axis=1)], axis=1).astype(np.int16)
+    display = np.empty((len(features), 6))
+    # Features are stored as float32; cents absorb the representation error
+    display[:, 0] = np.round(features[:, 0] * BUDGET_SCALE, 2)
+    display[:, 1:] = np.round(features[:, 7:12] * 100, 1)
+    return labels, display
+
+def write_decoded(artifact_dir, features, weather_map, activity_map):
+    """Write labels.npy and display.npy for features, block by block"""
+    labels = np.lib.format.open_memmap(os.path.join(artifact_dir, LABELS_FILE), mode='w+',
+                                       dtype=np.int16, shape=(len(features), 2))
+    display = np.lib.format.open_memmap(os.path.join(artifact_dir, DISPLAY_FILE), mode='w+',
+                                        dtype=np.float64, shape=(len(features), 6))
+    for start in range(0, len(features), DECODE_BLOCK_ROWS):
+        stop = start + DECODE_BLOCK_ROWS
+        labels[start:stop], display[start:stop] = decode_rows(features[start:stop], weather_map, activity_map)
+    labels.flush()
+    display.flush()
+
+def content_hash(features, names_blob, weather_map, activity_map, block_rows=1 << 16):
+    """Fingerprint the artifact contents so derived files can detect staleness"""
+    digest = hashlib.sha256()
+    for start in range(0, len(features), block_rows):
+        digest.update(np.ascontiguousarray(features[start:start + block_rows], dtype=np.float32).tobytes())
+    digest.update(names_blob)
+    digest.update(json.dumps([weather_map, activity_map], sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+def shrink_npy(path, rows):
+    """Truncate a 2-D .npy file to its first rows, rewriting the header in place"""
+    with open(path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        if version != (1, 0):
+            raise ValueError("Only version 1.0 .npy files can be shrunk in place")
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        data_offset = f.tell()
+        header = repr({'descr': np.lib.format.dtype_to_descr(dtype),
+                       'fortran_order': fortran_order,
+                       'shape': (rows,) + tuple(shape[1:])})
+        # The new shape is never longer than the old one, so padding keeps the data offset
+        header = header.ljust(data_offset - 10 - 1) + '\n'
+        f.seek(10)
+        f.write(header.encode('latin1'))
+        f.truncate(data_offset + rows * int(np.prod(shape[1:])) * dtype.itemsize)
+
+def commit_dir(tmp_dir, out_dir):
+    """Move a fully written directory into place, replacing any previous one"""
+    parent = os.path.dirname(out_dir)
+    if os.path.isdir(out_dir):
+        old_dir = tempfile.mkdtemp(prefix='.model-old-', dir=parent)
+        os.rename(out_dir, os.path.join(old_dir, 'model'))
+        os.rename(tmp_dir, out_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.rename(tmp_dir, out_dir)
+
+class ArtifactBuilder:
+    """Stream destinations into a new artifact without holding the catalogue in memory
+
+    Rows go straight into a preallocated, memory-mapped features.npy sized for
+    capacity rows; close() trims it to the rows actually appended, writes the
+    string table and header, and swaps the directory into place.
+    """
+
+    def __init__(self, out_dir, capacity, weather_map, activity_map, n_features=12):
+        self.out_dir = os.path.abspath(out_dir)
+        self.weather_map = weather_map
+        self.activity_map = activity_map
+        parent = os.path.dirname(self.out_dir)
+        os.makedirs(parent, exist_ok=True)
+        self.tmp_dir = tempfile.mkdtemp(prefix='.model-', dir=parent)
+        self.features = np.lib.format.open_memmap(
+            os.path.join(self.tmp_dir, FEATURES_FILE), mode='w+', dtype=np.float32,
+            shape=(max(capacity, 1), n_features))
+        self.names_file = open(os.path.join(self.tmp_dir, NAMES_FILE), 'wb')
+        self.name_lengths = []
+        self.rows = 0
+
+    def append(self, features, names):
+        """Copy a block of encoded rows and their names into the artifact"""
+        n = len(features)
+        if n != len(names):
+            raise ValueError("Feature matrix must have one row per destination")
+        if self.rows + n > len(self.features):
+            raise ValueError("Artifact capacity exceeded")
+        self.features[self.rows:self.rows + n] = features
+        blob, offsets = encode_string_table(names)
+        self.names_file.write(blob)
+        self.name_lengths.append(np.diff(offsets))
+        self.rows += n
+
+    def append_blob(self, features, names_blob, name_offsets):
+        """Copy rows whose names are already packed as a string table, e.g. from another artifact"""
+        n = len(features)
+        if self.rows + n > len(self.features):
+            raise ValueError("Artifact capacity exceeded")
+        self.features[self.rows:self.rows + n] = features
+        self.names_file.write(bytes(names_blob[name_offsets[0]:name_offsets[-1]]))
+        self.name_lengths.append(np.diff(name_offsets))
+        self.rows += n
+
+    def abort(self):
+        self.names_file.close()
+        self.features = None
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def close(self, extra_header=None):
+        """Finish the artifact and move it into place; returns its header"""
+        try:
+            n_features = self.features.shape[1]
+            self.features.flush()
+            self.features = None
+            self.names_file.close()
+            features_path = os.path.join(self.tmp_dir, FEATURES_FILE)
+            shrink_npy(features_path, self.rows)
+
+            offsets = np.zeros(self.rows + 1, dtype=np.int64)
+            if self.name_lengths:
+                np.cumsum(np.concatenate(self.name_lengths), out=offsets[1:])
+            np.save(os.path.join(self.tmp_dir, NAME_OFFSETS_FILE), offsets)
+
+            features = np.load(features_path, mmap_mode='r')
+            with open(os.path.join(self.tmp_dir, NAMES_FILE), 'rb') as f:
+                names_blob = f.read()
+            header = {
+                "schema_version": SCHEMA_VERSION,
+                "n_destinations": int(self.rows),
+                "n_features": int(n_features),
+                "weather_map": self.weather_map,
+                "activity_map": self.activity_map,
+                "content_hash": content_hash(features, names_blob, self.weather_map, self.activity_map)
+            }
+            header.update(extra_header or {})
+            write_decoded(self.tmp_dir, features, self.weather_map, self.activity_map)
+            del features
+            with open(os.path.join(self.tmp_dir, HEADER_FILE), 'w', encoding='utf-8') as f:
+                json.dump(header, f, indent=2)
+            commit_dir(self.tmp_dir, self.out_dir)
+        except Exception:
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+            raise
+        return header
+
+def write_artifact(out_dir, features, names, weather_map, activity_map, extra_header=None):
+    """Write a model artifact directory atomically and return its header"""
+    features = np.asarray(features, dtype=np.float32)
+    if features.ndim != 2 or features.shape[0] != len(names):
+        raise ValueError("Feature matrix must have one row per destination")
+
+    builder = ArtifactBuilder(out_dir, len(features), weather_map, activity_map, features.shape[1])
+    try:
+        builder.append(features, names)
+    except Exception:
+        builder.abort()
+        raise
+    return builder.close(extra_header)
+
+def read_header(artifact_dir):
+    """Read and version-check an artifact header"""
+    with open(os.path.join(artifact_dir, HEADER_FILE), encoding='utf-8') as f:
+        header = json.load(f)
+    if header.get('schema_version') != SCHEMA_VERSION:
+        raise ValueError(f"Unsupported model schema version: {header.get('schema_version')}")
+    return header
+
+def open_artifact(artifact_dir):
+    """Open an artifact with its feature matrix memory-mapped read-only"""
+    header = read_header(artifact_dir)
+    features = np.load(os.path.join(artifact_dir, FEATURES_FILE), mmap_mode='r')
+    offsets = np.load(os.path.join(artifact_dir, NAME_OFFSETS_FILE))
+    names_blob = np.memmap(os.path.join(artifact_dir, NAMES_FILE), dtype=np.uint8, mode='r') \
+        if offsets[-1] > 0 else b''
+
+    if features.shape != (header['n_destinations'], header['n_features']):
+        raise ValueError("Feature matrix does not match the artifact header")
+
+    if os.path.exists(os.path.join(artifact_dir, DISPLAY_FILE)):
+        labels = np.load(os.path.join(artifact_dir, LABELS_FILE), mmap_mode='r')
+        display = np.load(os.path.join(artifact_dir, DISPLAY_FILE), mmap_mode='r')
+    else:
+        # Artifacts written before the decoded columns existed
+        labels, display = decode_rows(features, header['weather_map'], header['activity_map'])
+
+    return {
+        'header': header,
+        'artifact_dir': artifact_dir,
+        'features': features,
+        'labels': labels,
+        'display': display,
+        'destinations': decode_string_table(names_blob, offsets),
+        'weather_map': header['weather_map'],
+        'activity_map': header['activity_map']
+    }
+
+def read_pickle_model(pkl_path):
+    """Return (features, names, weather_map, activity_map) from a legacy model.pkl"""
+    # Unpickling pulls in sklearn for the stored scaler and estimator; only this one-off conversion pays for it
+    import pickle
+    with open(pkl_path, 'rb') as f:
+        model_data = pickle.load(f)
+    if not isinstance(model_data, dict):
+        raise ValueError("Invalid model format")
+    return (
+        np.asarray(model_data['features'], dtype=np.float32),
+        list(model_data['destinations']),
+        model_data['weather_map'],
+        model_data['activity_map']
+    )
+
+def convert_pickle(pkl_path, out_dir):
+    """Convert a legacy model.pkl into an artifact directory and return its header"""
+    features, names, weather_map, activity_map = read_pickle_model(pkl_path)
+    return write_artifact(out_dir, features, names, weather_map, activity_map,
+                          {"converted_from": os.path.basename(pkl_path)})
+
+def main():
+    if len(sys.argv) not in (3, 4) or sys.argv[1] != 'convert':
+        print(json.dumps({"error": "Usage: model_store.py convert MODEL_PKL [OUT_DIR]"}))
+        sys.exit(1)
+
+    pkl_path = sys.argv[2]
+    out_dir = sys.argv[3] if len(sys.argv) == 4 else os.path.join(os.path.dirname(os.path.abspath(pkl_path)), 'model')
+    header = convert_pickle(pkl_path, out_dir)
+    print(json.dumps({"status": "success", "artifact": out_dir, "destinations": header['n_destinations']}))
+
+if __name__ == "__main__":
+    main()
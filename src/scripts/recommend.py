@@ -1,22 +1,34 @@
 import sys
 import json
-import pickle
+import base64
+from collections import OrderedDict
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler
-import warnings
-from sklearn.exceptions import DataConversionWarning
 import os
+import time
+import threading
+from model_store import open_artifact, convert_pickle, BUDGET_SCALE
+from index import BruteForceIndex, load_index, search_rows
+from response_cache import ResponseCache
+from filters import FILTER_KEYS, PROFILE_FIELDS, attribute_index, search_options, options_key
+from deltas import artifact_fingerprint, merge_deltas
+from similarity import load_similarity, destination_row, similar_neighbors
+from telemetry import log_debug, log_info, log_warning, log_error, stage, count
 
-warnings.filterwarnings('ignore', category=DataConversionWarning)
+MODEL_DIR = 'model'
+ANSWER_TABLE_FILE = 'answer_table.json'
+ANSWER_TABLE_STEP = 50
+N_NEIGHBORS = 8
+DEFAULT_K = 5
+MAX_K = 100
+MAX_POOL = 1000
+PAGE_CACHE_SIZE = 256
+RELOAD_CHECK_SECONDS = float(os.environ.get('MODEL_RELOAD_SECONDS', 2))
+DEFAULT_PROFILE = [0.8, 0.8, 0.7, 0.8, 0.8]  # safety, popularity, language, cuisine, nightlife
+DEFAULT_SIMILARITY_WEIGHT = 0.5
 
-def debug_log(message, data=None):
-    """Print debug information to stderr"""
-    debug_info = {
-        "type": "debug",
-        "message": message,
-        "data": data
-    }
-    print(json.dumps(debug_info), file=sys.stderr)
+_page_cache = OrderedDict()
+_page_cache_lock = threading.Lock()
+response_cache = ResponseCache()
 
 def error_response(message):
     """Return error response in JSON format"""
@@ -25,39 +37,526 @@ def error_response(message):
         "success": False
     })
 
-def success_response(recommendations):
+def success_response(recommendations, next_cursor=None):
     """Return success response in JSON format"""
     return json.dumps({
         "success": True,
-        "recommendations": recommendations
+        "recommendations": recommendations,
+        "next_cursor": next_cursor
     })
 
-def load_model():
+def load_model(artifact_dir=None):
     try:
         script_dir = os.path.dirname(os.path.abspath(__file__))
+        artifact_dir = artifact_dir or os.path.join(script_dir, MODEL_DIR)
         model_path = os.path.join(script_dir, 'model.pkl')
-        debug_log("Attempting to load model from: " + model_path)
+
+        converted = False
+        if not os.path.isdir(artifact_dir):
+            log_info("Converting legacy model from: " + model_path)
+            convert_pickle(model_path, artifact_dir)
+            converted = True
+
+        log_info("Attempting to load model from: " + artifact_dir)
         
-        with open(model_path, 'rb') as f:
-            model_data = pickle.load(f)
-            debug_log("Model loaded successfully", {
-                "type": type(model_data).__name__,
-                "keys": list(model_data.keys()) if isinstance(model_data, dict) else None
-            })
-            return model_data
+        model_data = open_model(artifact_dir)
+        log_info("Model loaded successfully", {
+            "schema_version": model_data['header']['schema_version'],
+            "destinations": model_data['header']['n_destinations']
+        })
+
+        if model_data['answer_table'] is None and converted:
+            model_data['answer_table'] = build_answer_table(model_data)
+            save_answer_table(artifact_dir, model_data['answer_table'], model_data)
+        return model_data
     except FileNotFoundError:
         error_msg = "Model file not found at: " + str(model_path)
-        debug_log("Error", {"error": error_msg})
+        log_error("Error", {"error": error_msg})
         print(error_response(error_msg), file=sys.stdout)
         sys.exit(1)
     except Exception as e:
         error_msg = f"Error loading model: {str(e)}"
-        debug_log("Error", {"error": error_msg})
+        log_error("Error", {"error": error_msg})
         print(error_response(error_msg), file=sys.stdout)
         sys.exit(1)
 
+def open_model(artifact_dir):
+    """Open an artifact with its search index and answer table, with any delta segments merged in"""
+    with stage("model_load"):
+        model_data = open_artifact(artifact_dir)
+        model_data['index'] = load_index(artifact_dir, model_data)
+        model_data['answer_table'] = load_answer_table(artifact_dir, model_data)
+        model_data['similarity'] = load_similarity(artifact_dir, model_data)
+        return merge_deltas(model_data)
+
+class LiveModel:
+    """The current model of a long-lived process, swapped when the artifact or its deltas change
+
+    A background thread polls the artifact and fully opens a new version
+    before replacing the reference. Requests read the reference once, so
+    in-flight requests finish on the version they started with; its memory
+    maps stay valid even after compaction removes the old files.
+    """
+
+    def __init__(self, artifact_dir=None, interval=RELOAD_CHECK_SECONDS):
+        self.artifact_dir = artifact_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), MODEL_DIR)
+        self.fingerprint = artifact_fingerprint(self.artifact_dir)
+        self.model = load_model(self.artifact_dir)
+        self.reloads = 0
+        if interval > 0:
+            threading.Thread(target=self._poll, args=(interval,), daemon=True).start()
+
+    def _poll(self, interval):
+        while True:
+            time.sleep(interval)
+            self.refresh()
+
+    def refresh(self):
+        """Load and swap in a changed artifact; returns True if the model was replaced"""
+        fingerprint = artifact_fingerprint(self.artifact_dir)
+        if fingerprint == self.fingerprint:
+            return False
+        try:
+            model_data = open_model(self.artifact_dir)
+        except Exception as e:
+            # Usually a compaction swapping directories mid-read; the next poll retries
+            log_warning("Model reload failed", {"error": str(e)})
+            return False
+        self.model = model_data
+        self.fingerprint = fingerprint
+        self.reloads += 1
+        count("model.reloads")
+        log_info("Model reloaded", {"content_hash": model_data['header']['content_hash'],
+                                    "destinations": model_data['header']['n_destinations']})
+        return True
+
+    def stats(self):
+        header = self.model['header']
+        return {"content_hash": header['content_hash'], "destinations": header['n_destinations'],
+                "reloads": self.reloads, "deltas": self.model.get('deltas')}
+
+def validate_model(model_data):
+    """Raise ValueError unless model_data has every component inference needs"""
+    if not isinstance(model_data, dict):
+        raise ValueError("Invalid model format")
+
+    required = ['destinations', 'features', 'weather_map', 'activity_map']
+    if any(model_data.get(key) is None or len(model_data[key]) == 0 for key in required):
+        raise ValueError("Missing required model components")
+
+def kneighbors(model_data, queries, k):
+    """k nearest destinations for each query through the model's search index, nearest first"""
+    index = model_data.get('index')
+    if index is None:
+        index = model_data['index'] = BruteForceIndex(model_data['features'])
+    return index.search(queries, k)
+
+def check_budget(budget):
+    """Raise ValueError for a budget that is NaN or infinite"""
+    if not np.isfinite(budget):
+        raise ValueError("budget must be a finite number")
+
+def label_codes(values, mapping):
+    """Map lower-cased labels to their row in mapping, -1 for unknown labels"""
+    lookup = {key: i for i, key in enumerate(mapping.keys())}
+    return np.fromiter((lookup.get(str(v).lower(), -1) for v in values), dtype=np.int64, count=len(values))
+
+def encode_labels(values, mapping, kind):
+    """Map lower-cased labels to their row in mapping, rejecting unknown labels"""
+    codes = label_codes(values, mapping)
+    if (codes < 0).any():
+        raise ValueError(f"Invalid {kind} preference. Must be one of: {', '.join(mapping.keys())}")
+    return codes
+
+def build_query_matrix(budgets, weathers, activities, weather_map, activity_map, profile=None):
+    """Encode N preference profiles into an (N, 12) query matrix
+
+    profile overrides the default targets for the five score features, e.g. {'safety': 0.95}.
+    """
+    weather_codes = encode_labels(weathers, weather_map, "weather")
+    activity_codes = encode_labels(activities, activity_map, "activity")
+
+    weather_values = np.array(list(weather_map.values()), dtype=float)
+    activity_values = np.array(list(activity_map.values()), dtype=float)
+
+    n = len(weather_codes)
+    queries = np.empty((n, 12))
+    queries[:, 0] = np.clip(np.asarray(budgets, dtype=float) / BUDGET_SCALE, 0, 1)
+    queries[:, 1] = weather_values[weather_codes]
+    queries[:, 2:7] = activity_values[activity_codes]
+    queries[:, 7:] = DEFAULT_PROFILE
+    for name, value in (profile or {}).items():
+        queries[:, 7 + PROFILE_FIELDS.index(name)] = value
+    return queries
+
+def decode_neighbors(model_data, indices, distances):
+    """Build the response records for every row of a kneighbors result at once"""
+    destinations = model_data['destinations']
+    weather_names = list(model_data['weather_map'].keys())
+    activity_names = list(model_data['activity_map'].keys())
+
+    match_scores = np.round((1 - distances) * 100, 1).tolist()
+    labels = model_data['labels'][indices].tolist()
+    display = model_data['display'][indices].tolist()
+
+    return [
+        [
+            {
+                "destination": destinations[idx],
+                "match_score": score,
+                "features": {
+                    "budget": budget,
+                    "weather": weather_names[w],
+                    "activity": activity_names[a],
+                    "safety_score": safety,
+                    "popularity": popularity,
+                    "language_barrier": language,
+                    "cuisine_rating": cuisine,
+                    "nightlife": nightlife
+                }
+            }
+            for idx, score, (w, a), (budget, safety, popularity, language, cuisine, nightlife)
+            in zip(row_indices, row_scores, row_labels, row_display)
+        ]
+        for row_indices, row_scores, row_labels, row_display
+        in zip(indices.tolist(), match_scores, labels, display)
+    ]
+
+def build_answer_table(model_data, step=ANSWER_TABLE_STEP, k=N_NEIGHBORS):
+    """Precompute neighbors for every weather x activity pair over a quantized budget grid"""
+    validate_model(model_data)
+    weathers = list(model_data['weather_map'].keys())
+    activities = list(model_data['activity_map'].keys())
+    budgets = np.arange(0, BUDGET_SCALE + step, step, dtype=float)
+
+    w, a, b = np.meshgrid(np.arange(len(weathers)), np.arange(len(activities)),
+                          np.arange(len(budgets)), indexing='ij')
+    queries = build_query_matrix(budgets[b.ravel()],
+                                 [weathers[i] for i in w.ravel()],
+                                 [activities[i] for i in a.ravel()],
+                                 model_data['weather_map'], model_data['activity_map'])
+    distances, indices = kneighbors(model_data, queries, k)
+
+    shape = (len(weathers), len(activities), len(budgets), indices.shape[1])
+    return {
+        'step': float(step),
+        'distances': distances.reshape(shape),
+        'indices': indices.astype(np.int32).reshape(shape)
+    }
+
+def save_answer_table(artifact_dir, table, model_data):
+    """Store an answer table inside the artifact, stamped with the artifact content hash"""
+    np.save(os.path.join(artifact_dir, 'answer_distances.npy'), table['distances'])
+    np.save(os.path.join(artifact_dir, 'answer_indices.npy'), table['indices'])
+    tmp_path = os.path.join(artifact_dir, ANSWER_TABLE_FILE + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "step": table['step'],
+            "k": int(table['indices'].shape[-1]),
+            "content_hash": model_data['header']['content_hash']
+        }, f)
+    os.replace(tmp_path, os.path.join(artifact_dir, ANSWER_TABLE_FILE))
+
+def load_answer_table(artifact_dir, model_data):
+    """Map the artifact's answer table, or return None if it is missing or stale"""
+    path = os.path.join(artifact_dir, ANSWER_TABLE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('content_hash') != model_data['header']['content_hash']:
+        log_warning("Ignoring stale answer table", {"path": path})
+        return None
+    return {
+        'step': meta['step'],
+        'distances': np.load(os.path.join(artifact_dir, 'answer_distances.npy'), mmap_mode='r'),
+        'indices': np.load(os.path.join(artifact_dir, 'answer_indices.npy'), mmap_mode='r')
+    }
+
+def table_lookup(table, budgets, weather_codes, activity_codes, k):
+    """Answer profiles whose budget sits on the table grid; returns (distances, indices, on_grid)"""
+    step = float(table['step'])
+    slots = np.clip(np.asarray(budgets, dtype=float), 0, BUDGET_SCALE) / step
+    on_grid = slots == np.round(slots)
+    slots = np.where(on_grid, slots, 0).astype(np.int64)
+    distances = table['distances'][weather_codes, activity_codes, slots, :k]
+    indices = table['indices'][weather_codes, activity_codes, slots, :k].astype(np.int64)
+    return distances, indices, on_grid
+
+def filtered_neighbors(model_data, queries, k, options):
+    """Exact weighted search over the destinations that pass the hard constraints
+
+    Constraints are resolved through the attribute index first, so only the
+    matching rows are scored and a page is never emptied by post-filtering.
+    """
+    rows = None
+    if options['constraints'] is not None or model_data.get('deltas'):
+        # With deltas the live rows always come from the index, which hides replaced base rows
+        rows = attribute_index(model_data).candidate_rows(options['constraints'] or {})
+    return search_rows(model_data['features'], queries, k, rows, options['weights'])
+
+def find_neighbors(model_data, budgets, weathers, activities, k, queries=None, options=None):
+    """Return (distances, indices) for N profiles, from the answer table where possible"""
+    weather_map = model_data['weather_map']
+    activity_map = model_data['activity_map']
+    if queries is None:
+        queries = build_query_matrix(budgets, weathers, activities, weather_map, activity_map,
+                                     options and options['profile'])
+
+    if options is not None:
+        return filtered_neighbors(model_data, queries, k, options)
+
+    table = model_data.get('answer_table')
+    if table is None or k > table['indices'].shape[-1]:
+        return kneighbors(model_data, queries, k)
+
+    distances, indices, on_grid = table_lookup(table, budgets,
+                                               label_codes(weathers, weather_map),
+                                               label_codes(activities, activity_map), k)
+    if not on_grid.all():
+        # Query at the table's depth so tied distances order the same on and off the grid
+        live = ~on_grid
+        live_distances, live_indices = kneighbors(model_data, queries[live], table['indices'].shape[-1])
+        distances[live], indices[live] = live_distances[:, :k], live_indices[:, :k]
+    return distances, indices
+
+def recommend_many(model_data, budgets, weathers, activities, k=5):
+    """Return the top-k recommendations for each of N preference profiles"""
+    validate_model(model_data)
+    if len(budgets) == 0:
+        return []
+    with stage("neighbor_search"):
+        distances, indices = find_neighbors(model_data, budgets, weathers, activities, k)
+    with stage("decode"):
+        return decode_neighbors(model_data, indices, distances)
+
+def page_candidates(model_data, budget, weather, activity, size, queries=None, options=None):
+    """Sorted neighborhood of at least size destinations for one profile, reused across pages
+
+    Returns (distances, indices, exhausted); exhausted is True when the pool
+    holds every matching destination, and otherwise more destinations match
+    than the pool holds. Unfiltered pools are complete once they cover the
+    catalogue, so they are fetched at exactly size and can come from the
+    answer table; filtered pools fetch one candidate beyond size to tell.
+    Pages of the same query are served from the cached pool; a page past its
+    end recomputes once with a doubled pool instead of once per page.
+    """
+    key = (model_data['header']['content_hash'], float(budget), weather.lower(), activity.lower(),
+           options_key(options))
+    with _page_cache_lock:
+        cached = _page_cache.get(key)
+        if cached is not None and (cached[2] or len(cached[1]) >= size):
+            _page_cache.move_to_end(key)
+            return cached
+
+    if cached is not None:
+        size = max(size, 2 * len(cached[1]))
+    if options is None:
+        distances, indices = find_neighbors(model_data, [budget], [weather], [activity], size, queries)
+        exhausted = len(indices[0]) >= len(model_data['index'])
+    else:
+        distances, indices = find_neighbors(model_data, [budget], [weather], [activity], size + 1, queries, options)
+        exhausted = len(indices[0]) <= size
+    entry = (distances[0][:size], indices[0][:size], exhausted)
+    with _page_cache_lock:
+        _page_cache[key] = entry
+        _page_cache.move_to_end(key)
+        if len(_page_cache) > PAGE_CACHE_SIZE:
+            _page_cache.popitem(last=False)
+    return entry
+
+def encode_cursor(budget, weather, activity, offset, k, pool, filters=None):
+    """Opaque token a client sends back to fetch the next page"""
+    payload = json.dumps([budget, weather, activity, offset, k, pool, filters or None], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Return (budget, weather, activity, offset, k, pool, filters) from a cursor token"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        fields = json.loads(base64.urlsafe_b64decode(padded))
+        if len(fields) == 6:
+            # Cursors issued before filters were supported
+            fields.append(None)
+        budget, weather, activity, offset, k, pool, filters = fields
+        return float(budget), str(weather), str(activity), int(offset), int(k), pool, filters
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def recommend_page(model_data, budget, weather, activity, k=DEFAULT_K, offset=0, pool=None, filters=None):
+    """Return one page of recommendations and the cursor for the next page (None at the end)
+
+    filters holds optional feature weights, profile targets and hard
+    constraints (see filters.FILTER_KEYS).
+    """
+    validate_model(model_data)
+
+    check_budget(budget)
+    if not 1 <= k <= MAX_K:
+        raise ValueError(f"k must be between 1 and {MAX_K}")
+    if offset < 0:
+        raise ValueError("offset must not be negative")
+    if pool is not None and not 1 <= pool <= MAX_POOL:
+        raise ValueError(f"pool must be between 1 and {MAX_POOL}")
+
+    options = search_options(filters, model_data['weather_map'], model_data['activity_map'])
+
+    with stage("feature_build"):
+        input_features = build_query_matrix([budget], [weather], [activity],
+                                            model_data['weather_map'], model_data['activity_map'],
+                                            options and options['profile'])
+
+    log_debug("Finding nearest neighbors", lambda: {
+        "input_features": input_features[0].tolist()
+    })
+
+    # Candidates come back nearest first, so a page is a slice of the pool
+    size = max(pool or N_NEIGHBORS, offset + k)
+    with stage("neighbor_search"):
+        distances, indices, exhausted = page_candidates(model_data, budget, weather, activity, size,
+                                                        input_features, options)
+    # A pool that is not exhausted holds more than size candidates, so the next page is never empty
+    has_more = not exhausted or offset + k < len(indices)
+    distances, indices = distances[offset:offset + k], indices[offset:offset + k]
+
+    with stage("decode"):
+        recommendations = decode_neighbors(model_data, indices[None, :], distances[None, :])[0] if len(indices) else []
+
+    log_debug("Generated recommendations", {
+        "count": len(recommendations)
+    })
+
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(budget, weather, activity, offset + k, k, pool, filters)
+    return recommendations, next_cursor
+
+def recommend(model_data, budget, weather, activity, k=DEFAULT_K, offset=0, pool=None, filters=None):
+    """Return the top recommendations for one preference profile"""
+    return recommend_page(model_data, budget, weather, activity, k, offset, pool, filters)[0]
+
+def recommend_similar(model_data, destination, k=DEFAULT_K, offset=0, budget=None, weather=None, activity=None,
+                      weight=DEFAULT_SIMILARITY_WEIGHT):
+    """Destinations most like the named one, optionally blended with a preference profile
+
+    Without a profile the answer is read from the precomputed similarity
+    graph. With one, the preference candidates and the graph neighbours are
+    rescored together as (1 - weight) * preference distance + weight *
+    distance to the named destination.
+    """
+    validate_model(model_data)
+
+    if not 1 <= k <= MAX_K:
+        raise ValueError(f"k must be between 1 and {MAX_K}")
+    if offset < 0:
+        raise ValueError("offset must not be negative")
+    if not 0 <= weight <= 1:
+        raise ValueError("similarity_weight must be between 0 and 1")
+    if budget is not None:
+        check_budget(budget)
+
+    row = destination_row(model_data, destination)
+    size = offset + k
+    with stage("neighbor_search"):
+        if budget is None:
+            distances, indices = similar_neighbors(model_data, row, size)
+        else:
+            queries = build_query_matrix([budget], [weather], [activity],
+                                         model_data['weather_map'], model_data['activity_map'])
+            _, preferred, _ = page_candidates(model_data, budget, weather, activity, max(N_NEIGHBORS, 2 * size), queries)
+            _, similar = similar_neighbors(model_data, row, 2 * size)
+            candidates = np.union1d(preferred, similar)
+            candidates = candidates[candidates != row]
+            vectors = np.asarray(model_data['features'][candidates], dtype=float)
+            anchor = np.asarray(model_data['features'][row], dtype=float)
+            blended = ((1 - weight) * np.linalg.norm(vectors - queries[0], axis=1)
+                       + weight * np.linalg.norm(vectors - anchor, axis=1))
+            order = np.lexsort((candidates, blended))[:size]
+            distances, indices = blended[order], candidates[order]
+    distances, indices = distances[offset:], indices[offset:]
+
+    with stage("decode"):
+        return decode_neighbors(model_data, indices[None, :], distances[None, :])[0] if len(indices) else []
+
+def similar_request(model_data, params):
+    """Answer a request carrying similar_to; not paginated past the requested page"""
+    destination = str(params['similar_to'])
+    k = optional_int(params, 'k', DEFAULT_K)
+    offset = optional_int(params, 'offset', 0)
+    weight = float(params.get('similarity_weight', DEFAULT_SIMILARITY_WEIGHT))
+    budget = weather = activity = None
+    if params.get('budget') is not None:
+        budget = float(params['budget'])
+        weather, activity = str(params['weather']), str(params['activity'])
+
+    key = ('similar', destination.strip().casefold(), k, offset,
+           None if budget is None else (cache_budget(budget), weather.lower(), activity.lower(), weight))
+    version = model_data['header']['content_hash']
+    response = response_cache.get(key, version)
+    if response is None:
+        count("recommend.cache_misses")
+        recommendations = recommend_similar(model_data, destination, k, offset, budget, weather, activity, weight)
+        response = {"success": True, "recommendations": recommendations, "next_cursor": None}
+        response_cache.put(key, response, version)
+    return response
+
+def optional_int(params, key, default=None):
+    return int(params[key]) if params.get(key) is not None else default
+
+def cache_budget(budget):
+    """Budget as the response cache keys it: clipped like the query feature, to the cent"""
+    return round(min(max(budget, 0.0), float(BUDGET_SCALE)), 2)
+
+def handle_request(model_data, params):
+    """Answer one worker request with the same payload the CLI prints
+
+    Successful responses are cached on the normalized request; entries are
+    tied to the artifact content hash and dropped when the model changes.
+    """
+    count("recommend.requests")
+    try:
+        if params.get('similar_to') is not None:
+            return similar_request(model_data, params)
+        if params.get('cursor'):
+            budget, weather, activity, offset, k, pool, filters = decode_cursor(str(params['cursor']))
+        else:
+            budget = float(params['budget'])
+            weather, activity = str(params['weather']), str(params['activity'])
+            k = optional_int(params, 'k', DEFAULT_K)
+            offset = optional_int(params, 'offset', 0)
+            pool = optional_int(params, 'pool')
+            filters = {key: params[key] for key in FILTER_KEYS if params.get(key) is not None}
+        key = (cache_budget(budget), weather.lower(), activity.lower(), k, offset, pool,
+               json.dumps(filters, sort_keys=True) if filters else None)
+        version = model_data['header']['content_hash']
+        response = response_cache.get(key, version)
+        if response is None:
+            count("recommend.cache_misses")
+            recommendations, next_cursor = recommend_page(model_data, budget, weather, activity,
+                                                          k, offset, pool, filters)
+            response = {"success": True, "recommendations": recommendations, "next_cursor": next_cursor}
+            response_cache.put(key, response, version)
+        return response
+    except KeyError as e:
+        count("recommend.errors")
+        return {"error": f"Missing required parameter: {str(e)}", "success": False}
+    except (TypeError, ValueError) as e:
+        count("recommend.errors")
+        return {"error": f"Invalid input: {str(e)}", "success": False}
+    except Exception as e:
+        count("recommend.errors")
+        log_error("Unexpected error", {"error": str(e)})
+        return {"error": f"Unexpected error: {str(e)}", "success": False}
+
 def main():
-    if len(sys.argv) != 4:
+    if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+        from worker import run_worker
+        live = LiveModel()
+        run_worker(lambda params: handle_request(live.model, params), sys.argv[2:],
+                   stats=lambda: {"response_cache": response_cache.stats(), "model": live.stats()})
+        return
+
+    if len(sys.argv) not in (4, 5, 6):
         print(error_response("Invalid number of arguments"), file=sys.stdout)
         sys.exit(1)
 
@@ -65,91 +564,22 @@ def main():
         budget = float(sys.argv[1])
         weather = sys.argv[2].lower()
         activity = sys.argv[3].lower()
+        k = int(sys.argv[4]) if len(sys.argv) > 4 else DEFAULT_K
+        offset = int(sys.argv[5]) if len(sys.argv) > 5 else 0
 
-        debug_log("Loading model", {
+        log_debug("Loading model", {
             "budget": budget,
             "weather": weather,
             "activity": activity
         })
 
         model_data = load_model()
-        
-        if not isinstance(model_data, dict):
-            print(error_response("Invalid model format"), file=sys.stdout)
-            sys.exit(1)
-
-        model = model_data.get('model')
-        scaler = model_data.get('scaler')
-        destinations = model_data.get('destinations')
-        features = model_data.get('features')
-        weather_map = model_data.get('weather_map')
-        activity_map = model_data.get('activity_map')
-
-        if not all([model, destinations, features, weather_map, activity_map]):
-            print(error_response("Missing required model components"), file=sys.stdout)
-            sys.exit(1)
-
-        debug_log("Creating input features")
-
-        if weather not in weather_map:
-            print(error_response(f"Invalid weather preference. Must be one of: {', '.join(weather_map.keys())}"), file=sys.stdout)
-            sys.exit(1)
-
-        if activity not in activity_map:
-            print(error_response(f"Invalid activity preference. Must be one of: {', '.join(activity_map.keys())}"), file=sys.stdout)
-            sys.exit(1)
-
-        budget_scaled = budget / 5000  
-        budget_scaled = min(max(budget_scaled, 0), 1)  
-
-        input_features = np.array([
-            budget_scaled,  
-            weather_map[weather],  
-            *activity_map[activity],  
-            0.8,  
-            0.8,  
-            0.7,  
-            0.8,  
-            0.8   
-        ])
-
-        debug_log("Finding nearest neighbors", {
-            "input_features": input_features.tolist()
-        })
-
-        distances, indices = model.kneighbors([input_features])
-        
-        recommendations = []
-        for idx, distance in zip(indices[0], distances[0]):
-            destination = destinations[idx]
-            match_score = (1 - distance) * 100  
-            
-            dest_features = features[idx]
-            
-            recommendations.append({
-                "destination": destination,
-                "match_score": round(match_score, 1),
-                "features": {
-                    "budget": dest_features[0] * 5000,  # Convert back to actual budget
-                    "weather": next(k for k, v in weather_map.items() if abs(v - dest_features[1]) < 0.2),
-                    "activity": next(k for k, v in activity_map.items() if v == dest_features[2:7]),
-                    "safety_score": round(dest_features[7] * 100, 1),
-                    "popularity": round(dest_features[8] * 100, 1),
-                    "language_barrier": round(dest_features[9] * 100, 1),
-                    "cuisine_rating": round(dest_features[10] * 100, 1),
-                    "nightlife": round(dest_features[11] * 100, 1)
-                }
-            })
 
-        recommendations.sort(key=lambda x: x['match_score'], reverse=True)
-        
-        recommendations = recommendations[:5]
-
-        debug_log("Generated recommendations", {
-            "count": len(recommendations)
-        })
+        recommendations, next_cursor = recommend_page(model_data, budget, weather, activity, k, offset)
 
-        print(success_response(recommendations), file=sys.stdout)
+        with stage("serialize"):
+            output = success_response(recommendations, next_cursor)
+        print(output, file=sys.stdout)
 
     except ValueError as e:
         print(error_response(f"Invalid input: {str(e)}"), file=sys.stdout)
@@ -0,0 +1,82 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_SIZE', 4096))
+DEFAULT_TTL_SECONDS = float(os.environ.get('RESPONSE_CACHE_TTL', 3600))
+
+class ResponseCache:
+    """Bounded LRU cache of responses with a time-to-live and a data version
+
+    Entries written under one version are dropped as soon as the cache is
+    asked about a different one, so a new model artifact never serves answers
+    computed from the old one. Safe to share between worker threads.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.version = version
+
+    def get(self, key, version=None):
+        """Cached value for key, or None on a miss"""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds and self.clock() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, version=None):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (self.clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters for sizing the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
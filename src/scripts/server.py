@@ -0,0 +1,211 @@
+import os
+import json
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from telemetry import log_info, prometheus_text, snapshot, stage
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = int(os.environ.get('PYTHON_SERVICE_PORT', 8765))
+DEFAULT_THREADS = int(os.environ.get('PYTHON_SERVICE_THREADS', 4))
+DEFAULT_MAX_PENDING = int(os.environ.get('PYTHON_SERVICE_MAX_PENDING', 64))
+DEFAULT_TIMEOUT_SECONDS = float(os.environ.get('PYTHON_SERVICE_TIMEOUT', 10))
+KEEP_ALIVE_SECONDS = 30
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 411: 'Length Required',
+    413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable', 504: 'Gateway Timeout'
+}
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class EngineServer:
+    """HTTP/1.1 JSON front end for the recommendation and activity engines
+
+    Engines stay loaded in this process. Handlers run on a thread pool so the
+    event loop keeps accepting connections; requests beyond max_pending are
+    refused with 503 instead of queueing without bound, and a handler that
+    exceeds the timeout is answered with 504.
+    """
+
+    def __init__(self, routes, stats=None, threads=DEFAULT_THREADS, max_pending=DEFAULT_MAX_PENDING,
+                 timeout=DEFAULT_TIMEOUT_SECONDS):
+        self.routes = routes
+        self.extra_stats = stats
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='engine')
+        self.threads = threads
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self.counters = {"requests": 0, "rejected": 0, "timeouts": 0, "errors": 0, "connections": 0}
+
+    def stats(self):
+        stats = dict(self.counters, pending=self.pending, threads=self.threads, max_pending=self.max_pending)
+        if self.extra_stats:
+            stats.update(self.extra_stats())
+        stats["telemetry"] = snapshot()
+        return stats
+
+    async def read_request(self, reader):
+        """Parse one request; returns (method, path, headers, body) or None when the client is done"""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_SECONDS)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            return None
+        except asyncio.LimitOverrunError:
+            raise HttpError(400, "Request headers too large")
+
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, path, version = lines[0].split(' ', 2)
+        except ValueError:
+            raise HttpError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        headers[':version'] = version
+
+        body = b''
+        if 'transfer-encoding' in headers:
+            raise HttpError(411, "Chunked request bodies are not supported")
+        length = headers.get('content-length') or '0'
+        if not (length.isascii() and length.isdigit()):
+            raise HttpError(400, "Invalid Content-Length")
+        length = int(length)
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, "Request body too large")
+        if length:
+            body = await asyncio.wait_for(reader.readexactly(length), self.timeout)
+        return method.upper(), path.split('?', 1)[0], headers, body
+
+    async def dispatch(self, method, path, body):
+        """Run the route for one request and return (status, payload)"""
+        if path == '/health':
+            return 200, {"success": True, "status": "ok"}
+        if path == '/stats':
+            return 200, {"success": True, "stats": self.stats()}
+        if path == '/metrics':
+            return 200, prometheus_text()
+        handler = self.routes.get(path)
+        if handler is None:
+            raise HttpError(404, f"Unknown endpoint: {path}")
+        if method != 'POST':
+            raise HttpError(405, "Use POST with a JSON body")
+        try:
+            params = json.loads(body or b'{}')
+        except ValueError:
+            raise HttpError(400, "Request body must be JSON")
+        if not isinstance(params, dict):
+            raise HttpError(400, "Request body must be a JSON object")
+
+        if self.pending >= self.max_pending:
+            self.counters["rejected"] += 1
+            raise HttpError(503, "Recommendation engine is overloaded")
+        # The slot is released when the job finishes or is dropped from the
+        # queue, so a timed-out handler that is still running keeps counting
+        loop = asyncio.get_running_loop()
+        future = self.executor.submit(handler, params)
+        self.pending += 1
+        future.add_done_callback(lambda done: loop.call_soon_threadsafe(self.job_finished))
+        try:
+            return 200, await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            # A queued job is dropped; a running thread cannot be interrupted and its result is discarded
+            future.cancel()
+            self.counters["timeouts"] += 1
+            raise HttpError(504, "Request timed out")
+
+    def job_finished(self):
+        self.pending -= 1
+
+    async def handle_connection(self, reader, writer):
+        self.counters["connections"] += 1
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await self.read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    connection = headers.get('connection', '').lower()
+                    keep_alive = connection == 'keep-alive' if headers[':version'] == 'HTTP/1.0' \
+                        else connection != 'close'
+                    self.counters["requests"] += 1
+                    status, payload = await self.dispatch(method, path, body)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e), "success": False}
+                except Exception as e:
+                    self.counters["errors"] += 1
+                    status, payload = 500, {"error": f"Unexpected error: {str(e)}", "success": False}
+
+                if isinstance(payload, str):
+                    data, content_type = payload.encode('utf-8'), "text/plain; version=0.0.4"
+                else:
+                    with stage("serialize"):
+                        data, content_type = json.dumps(payload).encode('utf-8'), "application/json"
+                head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                        f"Content-Type: {content_type}",
+                        f"Content-Length: {len(data)}",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                if status == 503:
+                    head.append("Retry-After: 1")
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+        log_info("Service listening", {"host": host, "port": port, "threads": self.threads})
+        async with server:
+            await server.serve_forever()
+
+def engine_routes():
+    """Load both engines once and map endpoints to their request handlers; the model hot-swaps on updates"""
+    import recommend
+    import suggest_activities
+
+    live = recommend.LiveModel()
+    routes = {
+        '/recommend': lambda params: recommend.handle_request(live.model, params),
+        '/suggest-activities': suggest_activities.handle_request
+    }
+    stats = lambda: {
+        "model": live.stats(),
+        "recommend_cache": recommend.response_cache.stats(),
+        "suggest_cache": suggest_activities.response_cache.stats()
+    }
+    return routes, stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the recommendation engines over HTTP on localhost")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS, help="Engine threads")
+    parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING,
+                        help="Requests running or waiting before new ones get 503")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT_SECONDS, help="Per-request timeout in seconds")
+    args = parser.parse_args()
+
+    routes, stats = engine_routes()
+    server = EngineServer(routes, stats, args.threads, args.max_pending, args.timeout)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
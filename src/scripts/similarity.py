@@ -0,0 +1,139 @@
+import os
+import json
+import numpy as np
+
+from index import IVFIndex, SEARCH_BLOCK_ELEMENTS, exact_distances, order_candidates
+
+SIMILARITY_FILE = 'similarity.json'
+SIMILAR_NEIGHBORS = 16
+CELL_PROBES = 16
+
+def nearest_candidates(partial, width):
+    """Columns of the width smallest ranking distances per row, in no particular order"""
+    if partial.shape[1] <= width:
+        return np.broadcast_to(np.arange(partial.shape[1]), partial.shape)
+    return np.argpartition(partial, width - 1, axis=1)[:, :width]
+
+def exact_graph(features, m):
+    """Exact top-m neighbours of every row, one row block against the whole matrix at a time
+
+    Candidates are ranked with the ||x||^2 - 2 q.x expansion in float32 and
+    the best 2m are rescored exactly, as the brute-force index does.
+    """
+    n = len(features)
+    data = np.asarray(features, dtype=np.float32)
+    norms = np.einsum('nf,nf->n', data, data)
+    distances = np.empty((n, m))
+    indices = np.empty((n, m), dtype=np.int64)
+    block = max(1, SEARCH_BLOCK_ELEMENTS // n)
+    for start in range(0, n, block):
+        rows = data[start:start + block]
+        partial = norms - 2 * (rows @ data.T)
+        partial[np.arange(len(rows)), np.arange(start, start + len(rows))] = np.inf
+        candidates = nearest_candidates(partial, min(2 * m, n - 1))
+        exact = exact_distances(features, np.asarray(rows, dtype=float), candidates)
+        distances[start:start + len(rows)], indices[start:start + len(rows)] = order_candidates(exact, candidates, m)
+    return distances, indices
+
+def cell_graph(index, features, m, probes=CELL_PROBES):
+    """Approximate top-m neighbours using the IVF cells as blocks
+
+    Each cell is compared as one matrix product against the cells whose
+    centroids are closest to its own, so the work grows with N rather than
+    N^2. Recall rises with probes.
+    """
+    n = len(features)
+    offsets = np.asarray(index.offsets)
+    ids = np.asarray(index.ids)
+    vectors = np.asarray(index.vectors, dtype=np.float32)
+    vector_norms = np.einsum('nf,nf->n', vectors, vectors)
+    sizes = np.diff(offsets)
+    centroids = index.centroids
+    centroid_order = np.argsort(np.einsum('cf,cf->c', centroids, centroids) - 2 * (centroids @ centroids.T), axis=1)
+
+    distances = np.empty((n, m))
+    indices = np.empty((n, m), dtype=np.int64)
+    for cell in range(len(centroids)):
+        lo, hi = offsets[cell], offsets[cell + 1]
+        if lo == hi:
+            continue
+        # Probe at least probes cells, and enough of them to hold m other rows
+        order = centroid_order[cell]
+        n_cells = max(probes, int(np.searchsorted(np.cumsum(sizes[order]), m + 1)) + 1)
+        slots = np.concatenate([np.arange(offsets[c], offsets[c + 1]) for c in order[:n_cells]])
+        partial = vector_norms[slots] - 2 * (vectors[lo:hi] @ vectors[slots].T)
+        partial[ids[lo:hi, None] == ids[None, slots]] = np.inf
+        candidates = ids[slots][nearest_candidates(partial, min(2 * m, len(slots) - 1))]
+        queries = np.asarray(features[ids[lo:hi]], dtype=float)
+        exact = exact_distances(features, queries, candidates)
+        distances[ids[lo:hi]], indices[ids[lo:hi]] = order_candidates(exact, candidates, m)
+    return distances, indices
+
+def build_similarity(model_data, m=SIMILAR_NEIGHBORS, probes=CELL_PROBES):
+    """Item-to-item graph: each destination's m nearest other destinations, nearest first
+
+    Exact for catalogues searched by brute force; catalogues with an IVF
+    index reuse its cells.
+    """
+    features = model_data['features']
+    m = min(m, len(features) - 1)
+    index = model_data.get('index')
+    if isinstance(index, IVFIndex):
+        distances, indices = cell_graph(index, features, m, probes)
+    else:
+        distances, indices = exact_graph(features, m)
+    return {'exact': not isinstance(index, IVFIndex), 'distances': distances.astype(np.float32),
+            'indices': indices.astype(np.int32)}
+
+def save_similarity(artifact_dir, graph, content_hash):
+    """Store the graph inside the artifact, stamped with the artifact content hash"""
+    np.save(os.path.join(artifact_dir, 'similar_distances.npy'), graph['distances'])
+    np.save(os.path.join(artifact_dir, 'similar_indices.npy'), graph['indices'])
+    tmp_path = os.path.join(artifact_dir, SIMILARITY_FILE + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"m": int(graph['indices'].shape[1]), "exact": graph['exact'], "content_hash": content_hash}, f)
+    os.replace(tmp_path, os.path.join(artifact_dir, SIMILARITY_FILE))
+
+def load_similarity(artifact_dir, model_data):
+    """Map the artifact's similarity graph, or return None if it is missing or stale"""
+    path = os.path.join(artifact_dir, SIMILARITY_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('content_hash') != model_data['header']['content_hash']:
+        return None
+    return {
+        'exact': meta['exact'],
+        'distances': np.load(os.path.join(artifact_dir, 'similar_distances.npy'), mmap_mode='r'),
+        'indices': np.load(os.path.join(artifact_dir, 'similar_indices.npy'), mmap_mode='r')
+    }
+
+def destination_row(model_data, name):
+    """Row of a destination by case-insensitive name; the lookup is built on first use"""
+    rows = model_data.get('name_rows')
+    if rows is None:
+        hidden = set(np.asarray(model_data.get('hidden_rows', [])).tolist())
+        rows = {}
+        for row, destination in enumerate(model_data['destinations']):
+            if row not in hidden:
+                rows.setdefault(destination.casefold(), row)
+        model_data['name_rows'] = rows
+    row = rows.get(str(name).strip().casefold())
+    if row is None:
+        raise ValueError(f"Unknown destination: {name}")
+    return row
+
+def similar_neighbors(model_data, row, k):
+    """(distances, indices) of the k destinations most like row, nearest first
+
+    Served from the graph when it covers k; otherwise (no graph for this
+    model version, or k beyond its width) the row's own features are searched.
+    """
+    graph = model_data.get('similarity')
+    if graph is not None and k <= graph['indices'].shape[1]:
+        return np.asarray(graph['distances'][row, :k], dtype=float), np.asarray(graph['indices'][row, :k], dtype=np.int64)
+    query = np.asarray(model_data['features'][row:row + 1], dtype=float)
+    distances, indices = model_data['index'].search(query, k + 1)
+    others = indices[0] != row
+    return distances[0][others][:k], indices[0][others][:k]
@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+import platform
+import argparse
+import subprocess
+
+DEFAULT_MODULES = ['recommend', 'suggest_activities', 'itinerary']
+# Training-only dependencies that must never load on the inference path
+FORBIDDEN_MODULES = ['sklearn', 'pandas', 'scipy']
+DEFAULT_MAX_MS = 500
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def parse_importtime(stderr):
+    """Rows of (module, depth, self_us, cumulative_us) from `python -X importtime` output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        stripped = name.lstrip()
+        rows.append((stripped.strip(), (len(name) - len(stripped) - 1) // 2, int(self_us), int(cumulative_us)))
+    return rows
+
+def import_profile(module):
+    """Import one module in a fresh interpreter under -X importtime"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=SCRIPT_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                            env=dict(os.environ, ENGINE_LOG_LEVEL='off'))
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {result.stderr.strip().splitlines()[-1]}")
+    return parse_importtime(result.stderr)
+
+def module_report(module, repeats, top):
+    """Best-of-repeats import time of module, its slowest dependencies and any forbidden ones it loads"""
+    best = None
+    for _ in range(repeats):
+        rows = import_profile(module)
+        own = next((cumulative for name, depth, _, cumulative in rows if name == module and depth == 0), 0)
+        if best is None or own < best[0]:
+            best = (own, rows)
+    own, rows = best
+    loaded = {name.split('.')[0] for name, _, _, _ in rows}
+    slowest = sorted(rows, key=lambda row: -row[3])
+    return {
+        "import_ms": round(own / 1000, 1),
+        "process_import_ms": round(sum(cumulative for _, depth, _, cumulative in rows if depth == 0) / 1000, 1),
+        "modules_loaded": len(rows),
+        "forbidden": sorted(loaded.intersection(FORBIDDEN_MODULES)),
+        "slowest": [{"module": name, "self_ms": round(self_us / 1000, 2), "cumulative_ms": round(cumulative / 1000, 2)}
+                    for name, depth, self_us, cumulative in slowest if name != module][:top]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time report for the inference entry points")
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--repeats', type=int, default=3, help="Fresh interpreters per module; the fastest counts")
+    parser.add_argument('--top', type=int, default=10, help="Slowest dependencies listed per module")
+    parser.add_argument('--max-ms', type=float, default=DEFAULT_MAX_MS,
+                        help="Fail when a module takes longer than this to import")
+    parser.add_argument('-o', '--output', default='-', help="Report JSON ('-' for stdout)")
+    args = parser.parse_args()
+
+    report = {"python": platform.python_version(), "max_ms": args.max_ms, "modules": {}, "failures": []}
+    for module in args.modules:
+        result = report["modules"][module] = module_report(module, args.repeats, args.top)
+        if result["forbidden"]:
+            report["failures"].append(f"{module} imports {', '.join(result['forbidden'])}")
+        if result["import_ms"] > args.max_ms:
+            report["failures"].append(f"{module} took {result['import_ms']} ms to import (limit {args.max_ms} ms)")
+
+    text = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(text)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+
+    if report["failures"]:
+        print(json.dumps({"failures": report["failures"]}), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
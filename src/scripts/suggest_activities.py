@@ -1,8 +1,12 @@
 import sys
+import re
 import json
-import pickle
+import functools
+import unicodedata
 import numpy as np
 from datetime import datetime
+from response_cache import ResponseCache
+from telemetry import log_warning, stage, count
 
 default_features = {
     'beach_score': 0.5,
@@ -97,101 +101,277 @@ destination_features = {
     }
 }
 
+response_cache = ResponseCache()
+
+DESTINATION_ALIASES = {
+    'nyc': 'New York',
+    'new york city': 'New York',
+    'sf': 'San Francisco',
+    'san fran': 'San Francisco',
+    'bcn': 'Barcelona',
+    'roma': 'Rome',
+    'wien': 'Vienna',
+    'praha': 'Prague',
+    'athina': 'Athens',
+    'constantinople': 'Istanbul',
+    'oahu': 'Hawaii',
+    'honolulu': 'Hawaii',
+    'maui': 'Hawaii',
+    'the maldives': 'Maldives'
+}
+
+# Keyword rules for unknown destinations, applied in order: (keywords, scores to set, score floors)
+KEYWORD_RULES = [
+    (['beach', 'coast', 'island', 'bay', 'playa', 'mar', 'sea'], {'beach_score': 0.8, 'urban_score': 0.4}, {}),
+    (['historic', 'ancient', 'old', 'temple', 'palace', 'castle'], {'history_score': 0.8, 'culture_score': 0.7}, {}),
+    (['city', 'metro', 'town', 'ville', 'burg', 'port'], {'urban_score': 0.8, 'tech_score': 0.6}, {}),
+    (['silicon', 'tech', 'digital', 'smart'], {'tech_score': 0.8, 'urban_score': 0.7}, {}),
+    (['mountain', 'forest', 'lake', 'park', 'nature'], {'urban_score': 0.3, 'tech_score': 0.2}, {'beach_score': 0.4})
+]
+FEATURE_CACHE_SIZE = 16384
+
+def normalize_name(name):
+    """Case-, accent- and whitespace-insensitive form of a destination name"""
+    name = unicodedata.normalize('NFKD', str(name))
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    return ' '.join(name.casefold().split())
+
+def compile_destination_lookup(categories, aliases):
+    """One flat dict from normalized name (or alias) to destination features; first category wins"""
+    lookup = {}
+    for category in categories.values():
+        for destination, features in category.items():
+            lookup.setdefault(normalize_name(destination), features)
+    for alias, destination in aliases.items():
+        lookup.setdefault(normalize_name(alias), lookup[normalize_name(destination)])
+    return lookup
+
+def compile_keyword_matcher(rules):
+    """Single regex finding every keyword occurrence, plus the rules each keyword triggers
+
+    The lookahead reports a match at every position, so overlapping keywords
+    are all seen. Alternatives are tried longest first, and each keyword also
+    carries the rules of any keyword inside it, so a shorter keyword hidden
+    by a longer one at the same position still fires.
+    """
+    keywords = {word: 0 for words, _, _ in rules for word in words}
+    for i, (words, _, _) in enumerate(rules):
+        for word in words:
+            keywords[word] |= 1 << i
+    masks = {word: 0 for word in keywords}
+    for word in keywords:
+        for other, mask in keywords.items():
+            if other in word:
+                masks[word] |= mask
+    alternatives = sorted(keywords, key=lambda word: (-len(word), word))
+    pattern = re.compile('(?=(' + '|'.join(re.escape(word) for word in alternatives) + '))')
+    return pattern, masks
+
+destination_lookup = compile_destination_lookup(destination_features, DESTINATION_ALIASES)
+keyword_pattern, keyword_masks = compile_keyword_matcher(KEYWORD_RULES)
+
+def keyword_features(name):
+    """Default features adjusted by every keyword rule that matches name"""
+    fired = 0
+    for word in set(keyword_pattern.findall(name)):
+        fired |= keyword_masks[word]
+
+    features = default_features.copy()
+    for i, (_, values, floors) in enumerate(KEYWORD_RULES):
+        if fired >> i & 1:
+            for key, floor in floors.items():
+                features[key] = max(features[key], floor)
+            features.update(values)
+    return features
+
+@functools.lru_cache(maxsize=FEATURE_CACHE_SIZE)
+def resolve_destination(destination):
+    name = normalize_name(destination)
+    return destination_lookup.get(name) or keyword_features(name)
+
 def get_destination_features(destination):
-    """Get destination features from model or fallback to pre-defined features"""
+    """Get destination features from the known destinations, or estimate them from keywords in the name
+
+    Results are memoized and shared between calls; treat them as read-only.
+    """
     try:
-        if 'model_data' in globals():
-            model_features = model_data['destination_features'].get(destination)
-            if model_features is not None:
-                return model_features
-        
-        for category in destination_features.values():
-            if destination in category:
-                return category[destination]
-        
-        features = default_features.copy()
-        dest_lower = destination.lower()
-        
-        if any(word in dest_lower for word in ['beach', 'coast', 'island', 'bay', 'playa', 'mar', 'sea']):
-            features['beach_score'] = 0.8
-            features['urban_score'] = 0.4
-        
-        if any(word in dest_lower for word in ['historic', 'ancient', 'old', 'temple', 'palace', 'castle']):
-            features['history_score'] = 0.8
-            features['culture_score'] = 0.7
-        
-        if any(word in dest_lower for word in ['city', 'metro', 'town', 'ville', 'burg', 'port']):
-            features['urban_score'] = 0.8
-            features['tech_score'] = 0.6
-        
-        if any(word in dest_lower for word in ['silicon', 'tech', 'digital', 'smart']):
-            features['tech_score'] = 0.8
-            features['urban_score'] = 0.7
-        
-        if any(word in dest_lower for word in ['mountain', 'forest', 'lake', 'park', 'nature']):
-            features['beach_score'] = 0.4 if features['beach_score'] < 0.4 else features['beach_score']
-            features['urban_score'] = 0.3
-            features['tech_score'] = 0.2
-        
-        return features
-        
+        return resolve_destination(destination)
     except Exception as e:
-        print(f"Error getting destination features: {str(e)}", file=sys.stderr)
+        log_warning("Error getting destination features", {"destination": destination, "error": str(e)})
         return default_features
 
-def get_activity_score(activity, weather, time_of_day, destination_features):
-    """Calculate activity score based on multiple factors"""
+TIME_SLOTS = ['morning', 'afternoon', 'evening']
+SUGGESTION_COUNT = 5
+
+def compile_activities(db):
+    """Flatten an activities table into columns, each activity type's rows contiguous
+
+    Weather lists become bitmasks and best times become slot codes, so
+    scoring a whole type (or every type) is a handful of array operations.
+    """
+    weather_bits = {}
+    for activities in db.values():
+        for activity in activities:
+            for weather in activity['weather']:
+                weather_bits.setdefault(weather, 1 << len(weather_bits))
+
+    records = [activity for activities in db.values() for activity in activities]
+    offsets = np.zeros(len(db) + 1, dtype=np.int64)
+    np.cumsum([len(activities) for activities in db.values()], out=offsets[1:])
+    return {
+        'types': {activity_type: i for i, activity_type in enumerate(db)},
+        'offsets': offsets,
+        'records': records,
+        'weather_bits': weather_bits,
+        'weather_mask': np.array([sum(weather_bits[w] for w in set(a['weather'])) for a in records], dtype=np.int64),
+        'best_time': np.array([TIME_SLOTS.index(a['best_time']) if a['best_time'] in TIME_SLOTS else -1
+                               for a in records], dtype=np.int64),
+        'cost_factor': np.array([a['cost_factor'] for a in records], dtype=float),
+        'duration': np.array([a['duration'] for a in records], dtype=float)
+    }
+
+activity_index = compile_activities(activities_db)
+
+def score_rows(index, rows, weather, time_of_day, dest_features_list):
+    """Scores for activity rows at each destination, shape (n_destinations, n_rows), rounded like responses"""
+    weather_match = (index['weather_mask'][rows] & index['weather_bits'].get(weather, 0)) != 0
+    weather_score = np.where(weather_match, 1.0, 0.5)
+    slot = TIME_SLOTS.index(time_of_day) if time_of_day in TIME_SLOTS else -2
+    time_score = np.where(index['best_time'][rows] == slot, 1.0, 0.7)
+    # Column -1 serves activities whose best time is not a known slot
+    slot_scores = np.array([[features.get(name, 0.5) for name in TIME_SLOTS] + [0.5]
+                            for features in dest_features_list], dtype=float)
+    dest_score = slot_scores[:, index['best_time'][rows]]
+
+    raw = weather_score * 0.4 + time_score * 0.3 + dest_score * 0.3
+    # Few distinct values: round them with Python's round so ordering matches the scalar scores exactly
+    values, inverse = np.unique(raw, return_inverse=True)
+    return np.array([round(v, 2) for v in values.tolist()])[inverse].reshape(raw.shape)
+
+def suggest_many(destinations, weather, activity_types, budget, time_of_day=None, top=SUGGESTION_COUNT):
+    """Top suggestions for every destination x activity type pair in one pass
+
+    Returns {destination: {activity_type: [suggestion, ...]}}; unknown
+    activity types map to an error entry like suggest_activities.
+    """
+    if time_of_day is None:
+        time_of_day = time_of_day_bucket()
+    index = activity_index
+    with stage("destination_features"):
+        dest_features_list = [get_destination_features(d) for d in destinations]
+    known = [t for t in dict.fromkeys(activity_types) if t in index['types']]
+    rows = np.concatenate([np.arange(index['offsets'][index['types'][t]], index['offsets'][index['types'][t] + 1])
+                           for t in known]) if known else np.empty(0, dtype=np.int64)
+
+    with stage("activity_score"):
+        scores = score_rows(index, rows, weather, time_of_day, dest_features_list)
+    multipliers = np.array([features.get('cost_level', 1.0) for features in dest_features_list], dtype=float)
+    costs = (budget / 7) * index['cost_factor'][rows][None, :] * multipliers[:, None]
+
+    results = {destination: {} for destination in destinations}
+    start = 0
+    for activity_type in known:
+        t = index['types'][activity_type]
+        stop = start + int(index['offsets'][t + 1] - index['offsets'][t])
+        order = start + np.argsort(-scores[:, start:stop], axis=1, kind='stable')[:, :top]
+        top_rows = rows[order].tolist()
+        top_scores = np.take_along_axis(scores, order, axis=1).tolist()
+        top_costs = np.take_along_axis(costs, order, axis=1).tolist()
+        for destination, row_ids, row_scores, row_costs in zip(destinations, top_rows, top_scores, top_costs):
+            results[destination][activity_type] = [
+                {
+                    **index['records'][row],
+                    'destination_specific': f"{index['records'][row]['name']} in {destination}",
+                    'score': score,
+                    'estimated_cost': round(cost, 2)
+                }
+                for row, score, cost in zip(row_ids, row_scores, row_costs)
+            ]
+        start = stop
+
+    for destination in destinations:
+        per_type = results[destination]
+        for activity_type in activity_types:
+            if activity_type not in per_type:
+                per_type[activity_type] = [{"error": f"No activities found for type: {activity_type}"}]
+    return results
+
+def time_of_day_bucket(hour=None):
+    """Map an hour (default: now) to the morning/afternoon/evening slot activities are scored for"""
+    if hour is None:
+        hour = datetime.now().hour
+    return 'morning' if 5 <= hour < 12 else 'afternoon' if 12 <= hour < 17 else 'evening'
+
+def suggest_activities(destination, weather, activity_type, budget, time_of_day=None):
     try:
-        weather_score = 1.0 if weather in activity['weather'] else 0.5
-        time_score = 1.0 if activity['best_time'] == time_of_day else 0.7
-        
-        dest_score = destination_features.get(activity['best_time'], 0.5)
-        
-        final_score = (weather_score * 0.4 + time_score * 0.3 + dest_score * 0.3)
-        
-        return round(final_score, 2)
+        return suggest_many([destination], weather, [activity_type], budget, time_of_day)[destination][activity_type]
     except Exception as e:
-        print(f"Error calculating activity score: {str(e)}", file=sys.stderr)
-        return 0.5
+        return [{"error": str(e)}]
+
+def as_list(value):
+    """Wrap a lone string in a list so it is not iterated character by character"""
+    return [value] if isinstance(value, str) else value
 
-def suggest_activities(destination, weather, activity_type, budget):
+def handle_request(params):
+    """Answer one worker request with the same payload the CLI prints
+
+    Suggestions only depend on the inputs and the time-of-day slot, so
+    successful ones are cached on those, with the destination normalized,
+    weather and type lower-cased and the budget rounded to the cent.
+    """
+    count("suggest.requests")
     try:
-        dest_features = get_destination_features(destination)
-        
-        base_activities = activities_db.get(activity_type, [])
-        if not base_activities:
-            return [{"error": f"No activities found for type: {activity_type}"}]
-        
-        hour = datetime.now().hour
-        time_of_day = 'morning' if 5 <= hour < 12 else 'afternoon' if 12 <= hour < 17 else 'evening'
-        
-        scored_activities = []
-        daily_budget = budget / 7  
-        
-        for activity in base_activities:
-            try:
-                score = get_activity_score(activity, weather, time_of_day, dest_features)
-                
-                base_cost = daily_budget * activity['cost_factor']
-                dest_cost_multiplier = dest_features.get('cost_level', 1.0)
-                estimated_cost = round(base_cost * dest_cost_multiplier, 2)
-                
-                activity_copy = activity.copy()
-                activity_copy['destination_specific'] = f"{activity['name']} in {destination}"
-                activity_copy['score'] = score
-                activity_copy['estimated_cost'] = estimated_cost
-                scored_activities.append(activity_copy)
-            except Exception as e:
-                print(f"Error processing activity {activity['name']}: {str(e)}", file=sys.stderr)
-                continue
-        
-        scored_activities.sort(key=lambda x: x['score'], reverse=True)
-        return scored_activities[:5]
-        
+        if params.get('days') is not None:
+            from itinerary import plan_itinerary, DEFAULT_DAY_HOURS
+            activity_types = as_list(params.get('activity_types')) or \
+                ([params['activity_type']] if params.get('activity_type') else None)
+            max_hours = params.get('max_hours_per_day')
+            with stage("itinerary_plan"):
+                return {"itinerary": plan_itinerary(
+                    str(params['destination']),
+                    str(params['weather']),
+                    int(params['days']),
+                    float(params['budget']),
+                    [str(t) for t in activity_types] if activity_types else None,
+                    float(max_hours) if max_hours is not None else DEFAULT_DAY_HOURS
+                )}
+
+        if params.get('destinations') is not None or params.get('activity_types') is not None:
+            # Batch form for itinerary building: {destination: {activity_type: suggestions}}
+            destinations = [str(d) for d in as_list(params.get('destinations')) or [params['destination']]]
+            activity_types = [str(t) for t in as_list(params.get('activity_types')) or [params['activity_type']]]
+            return {"suggestions": suggest_many(destinations, str(params['weather']), activity_types,
+                                                float(params['budget']))}
+
+        destination = str(params['destination'])
+        weather = str(params['weather']).strip().lower()
+        activity_type = str(params['activity_type']).strip().lower()
+        budget = float(params['budget'])
+        time_of_day = time_of_day_bucket()
+
+        key = (normalize_name(destination), weather, activity_type, round(budget, 2), time_of_day)
+        suggestions = response_cache.get(key)
+        if suggestions is None:
+            suggestions = suggest_activities(destination, weather, activity_type, budget, time_of_day)
+            if not any('error' in s for s in suggestions):
+                response_cache.put(key, suggestions)
+        else:
+            # Spellings of a name share one entry; name the destination as this request did
+            suggestions = [{**s, 'destination_specific': f"{s['name']} in {destination}"} for s in suggestions]
+        return {"suggestions": suggestions}
+    except KeyError as e:
+        count("suggest.errors")
+        return {"error": f"Missing required parameter: {str(e)}"}
     except Exception as e:
-        return [{"error": str(e)}]
+        count("suggest.errors")
+        return {"error": str(e)}
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+        from worker import run_worker
+        run_worker(handle_request, sys.argv[2:], stats=lambda: {"response_cache": response_cache.stats()})
+        sys.exit(0)
+
     if len(sys.argv) != 5:
         print(json.dumps({"error": "Invalid arguments"}))
         sys.exit(1)
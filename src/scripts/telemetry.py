@@ -0,0 +1,177 @@
+import os
+import sys
+import json
+import time
+import atexit
+import random
+import threading
+
+LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40, 'off': 100}
+LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+# Upper bounds in seconds for the Prometheus stage histograms
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_threshold = LEVELS['info']
+_sample = 1.0
+_metrics_enabled = False
+_lock = threading.Lock()
+_counters = {}
+_stages = {}
+_snapshot_thread = None
+
+def configure(level=None, sample=None, metrics=None, snapshot_seconds=None):
+    """Set the log level, debug/info sampling rate and metrics switch; unset arguments come from the environment
+
+    ENGINE_LOG_LEVEL (debug, info, warning, error, off; default info),
+    ENGINE_LOG_SAMPLE (fraction of debug/info records kept; default 1),
+    ENGINE_METRICS (1 enables stage timers and counters) and
+    ENGINE_METRICS_INTERVAL (seconds between JSON snapshots on stderr; 0 disables).
+    """
+    global _threshold, _sample, _metrics_enabled, _snapshot_thread
+    level = level or os.environ.get('ENGINE_LOG_LEVEL', 'info')
+    _threshold = LEVELS[level.lower()] if isinstance(level, str) else int(level)
+    _sample = float(os.environ.get('ENGINE_LOG_SAMPLE', 1.0) if sample is None else sample)
+    if metrics is None:
+        metrics = os.environ.get('ENGINE_METRICS', '0').lower() in ('1', 'true', 'yes', 'on')
+    _metrics_enabled = bool(metrics)
+    if snapshot_seconds is None:
+        snapshot_seconds = float(os.environ.get('ENGINE_METRICS_INTERVAL', 0))
+
+    if _metrics_enabled and snapshot_seconds > 0 and _snapshot_thread is None:
+        _snapshot_thread = threading.Thread(target=_snapshot_loop, args=(snapshot_seconds,), daemon=True)
+        _snapshot_thread.start()
+        atexit.register(emit_snapshot)
+
+def enabled(level):
+    """True when records at level would be written; guard expensive payloads with it"""
+    return level >= _threshold
+
+def log(level, message, data=None):
+    """Write one JSON record to stderr if level passes the threshold and the sampler
+
+    data may be a callable, which is only evaluated for records that are written.
+    """
+    if level < _threshold:
+        return
+    if level < LEVELS['warning'] and _sample < 1.0 and random.random() >= _sample:
+        return
+    try:
+        record = {
+            "type": "log",
+            "level": LEVEL_NAMES.get(level, str(level)),
+            "message": message,
+            "data": data() if callable(data) else data
+        }
+        print(json.dumps(record), file=sys.stderr, flush=True)
+    except Exception as e:
+        print(f"Error in log: {str(e)}", file=sys.stderr)
+
+def log_debug(message, data=None):
+    log(LEVELS['debug'], message, data)
+
+def log_info(message, data=None):
+    log(LEVELS['info'], message, data)
+
+def log_warning(message, data=None):
+    log(LEVELS['warning'], message, data)
+
+def log_error(message, data=None):
+    log(LEVELS['error'], message, data)
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+class _Stage:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_stage(self.name, time.perf_counter() - self.start)
+        return False
+
+def stage(name):
+    """Context manager timing one pipeline stage; a shared no-op when metrics are off"""
+    return _Stage(name) if _metrics_enabled else _NULL_STAGE
+
+def record_stage(name, seconds):
+    if not _metrics_enabled:
+        return
+    with _lock:
+        timer = _stages.get(name)
+        if timer is None:
+            timer = _stages[name] = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(STAGE_BUCKETS)}
+        timer["count"] += 1
+        timer["sum"] += seconds
+        timer["max"] = max(timer["max"], seconds)
+        for i, bound in enumerate(STAGE_BUCKETS):
+            if seconds <= bound:
+                timer["buckets"][i] += 1
+                break
+
+def count(name, n=1):
+    """Add n to a named event counter"""
+    if not _metrics_enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def snapshot():
+    """Counters and per-stage timings (milliseconds) as a JSON-ready dict"""
+    with _lock:
+        return {
+            "enabled": _metrics_enabled,
+            "counters": dict(_counters),
+            "stages": {
+                name: {
+                    "count": timer["count"],
+                    "total_ms": round(timer["sum"] * 1000, 3),
+                    "mean_ms": round(timer["sum"] * 1000 / timer["count"], 4),
+                    "max_ms": round(timer["max"] * 1000, 3)
+                }
+                for name, timer in _stages.items()
+            }
+        }
+
+def prometheus_text(prefix='travel_engine'):
+    """Counters and stage histograms in the Prometheus text exposition format"""
+    lines = [f"# TYPE {prefix}_events_total counter"]
+    with _lock:
+        for name, value in sorted(_counters.items()):
+            lines.append(f'{prefix}_events_total{{event="{name}"}} {value}')
+        lines.append(f"# TYPE {prefix}_stage_seconds histogram")
+        for name, timer in sorted(_stages.items()):
+            cumulative = 0
+            for bound, n in zip(STAGE_BUCKETS, timer["buckets"]):
+                cumulative += n
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {timer["count"]}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {timer["sum"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {timer["count"]}')
+    return "\n".join(lines) + "\n"
+
+def emit_snapshot():
+    print(json.dumps({"type": "metrics", "data": snapshot()}), file=sys.stderr, flush=True)
+
+def _snapshot_loop(seconds):
+    while True:
+        time.sleep(seconds)
+        emit_snapshot()
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _stages.clear()
+
+configure()
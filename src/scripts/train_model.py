@@ -1,25 +1,17 @@
 import pandas as pd
-import numpy as np
-import pickle
 import json
-import sys
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.neighbors import NearestNeighbors
-
-def debug_log(message, data=None):
-    """Helper function to print debug information to stderr"""
-    try:
-        debug_info = {
-            "message": message,
-            "data": data
-        }
-        print(json.dumps(debug_info), file=sys.stderr)
-    except Exception as e:
-        print(f"Error in debug_log: {str(e)}", file=sys.stderr)
+import argparse
+from model_store import write_artifact, open_artifact
+from ingest import encode_chunk, build_from_catalogue
+from index import build_index, save_index, DEFAULT_NPROBE
+from recommend import build_answer_table, save_answer_table, MODEL_DIR, N_NEIGHBORS
+from filters import AttributeIndex
+from similarity import build_similarity, save_similarity
+from telemetry import log_info, log_warning
 
 def create_destination_dataset():
     """Create a dataset of travel destinations with features"""
-    debug_log("Creating destination dataset")
+    log_info("Creating destination dataset")
     
     destinations = [
         {"name": "Bali", "budget": 2000, "weather": "warm", "activity": "beach", "safety": 0.8, "popularity": 0.9, "language": 0.6, "cuisine": 0.9, "nightlife": 0.8},
@@ -58,84 +50,95 @@ def create_destination_dataset():
         {"name": "Madrid", "budget": 2500, "weather": "warm", "activity": "urban", "safety": 0.8, "popularity": 0.8, "language": 0.5, "cuisine": 0.9, "nightlife": 1.0}
     ]
     
-    debug_log("Dataset created", {"destinations": len(destinations)})
+    log_info("Dataset created", {"destinations": len(destinations)})
     return destinations
 
-def main():
-    debug_log("Starting model training")
+WEATHER_MAP = {
+    'cold': 0,
+    'cool': 0.33,
+    'mild': 0.66,
+    'warm': 1
+}
+
+ACTIVITY_MAP = {
+    'beach': [1, 0, 0, 0, 0],
+    'culture': [0, 1, 0, 0, 0],
+    'history': [0, 0, 1, 0, 0],
+    'technology': [0, 0, 0, 1, 0],
+    'urban': [0, 0, 0, 0, 1]
+}
+
+def build_derived(artifact_dir, index_kind='auto', index_params=None):
+    """Build the search index, answer table, attribute index and similarity graph for an artifact; returns the opened model"""
+    model_data = open_artifact(artifact_dir)
     
-    destinations = create_destination_dataset()
+    log_info("Building search index", {"kind": index_kind})
     
-    debug_log("Creating feature mappings")
+    model_data['index'] = build_index(model_data['features'], index_kind, **(index_params or {}))
+    save_index(model_data['index'], artifact_dir, model_data['header']['content_hash'])
     
-    weather_map = {
-        'cold': 0,
-        'cool': 0.33,
-        'mild': 0.66,
-        'warm': 1
-    }
+    log_info("Precomputing answer table")
     
-    activity_map = {
-        'beach': [1, 0, 0, 0, 0],
-        'culture': [0, 1, 0, 0, 0],
-        'history': [0, 0, 1, 0, 0],
-        'technology': [0, 0, 0, 1, 0],
-        'urban': [0, 0, 0, 0, 1]
-    }
+    model_data['answer_table'] = build_answer_table(model_data)
+    save_answer_table(artifact_dir, model_data['answer_table'], model_data)
+    
+    log_info("Building attribute index")
     
-    debug_log("Setting up feature weights")
+    model_data['attribute_index'] = AttributeIndex.build(model_data)
+    model_data['attribute_index'].save(artifact_dir, model_data['header']['content_hash'])
     
-    X = []
-    destination_names = []
+    log_info("Building similarity graph")
     
-    for dest in destinations:
-        budget = dest['budget'] / 5000
+    model_data['similarity'] = build_similarity(model_data)
+    save_similarity(artifact_dir, model_data['similarity'], model_data['header']['content_hash'])
+    return model_data
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the destination model artifact")
+    parser.add_argument('--catalogue', default=None,
+                        help="CSV, JSONL or Parquet catalogue export (default: built-in destination list)")
+    parser.add_argument('--index', choices=['auto', 'brute', 'ivf'], default='auto',
+                        help="Search index; auto uses IVF for large catalogues")
+    parser.add_argument('--n-lists', type=int, default=None, help="IVF cells (default 4 * sqrt(N))")
+    parser.add_argument('--nprobe', type=int, default=DEFAULT_NPROBE, help="IVF cells scanned per query")
+    args = parser.parse_args()
+
+    log_info("Starting model training")
+    
+    weather_map = WEATHER_MAP
+    activity_map = ACTIVITY_MAP
+    
+    if args.catalogue:
+        log_info("Ingesting catalogue", {"path": args.catalogue})
         
-        weather = weather_map[dest['weather']]
+        header, stats = build_from_catalogue(args.catalogue, MODEL_DIR, weather_map, activity_map,
+                                             extra_header={"n_neighbors": N_NEIGHBORS})
+        log_info("Catalogue ingested", stats)
+    else:
+        destinations = pd.DataFrame(create_destination_dataset())
         
-        activity = activity_map[dest['activity']]
+        log_info("Encoding features")
         
-        features = [
-            budget,  
-            weather,  
-            *activity,  
-            dest['safety'],  
-            dest['popularity'],  
-            dest['language'],  
-            dest['cuisine'],  
-            dest['nightlife'] 
-        ]
+        X, destination_names, rejected = encode_chunk(destinations, weather_map, activity_map)
+        if rejected:
+            log_warning("Rejected destinations", rejected)
         
-        X.append(features)
-        destination_names.append(dest['name'])
-    
-    X = np.array(X)
-    
-    debug_log("Training nearest neighbors model")
-    
-    model = NearestNeighbors(n_neighbors=8, metric='euclidean')
-    model.fit(X)
-    
-    debug_log("Saving model and data")
-    
-    model_data = {
-        'model': model,
-        'scaler': MinMaxScaler(),  
-        'destinations': destination_names,
-        'features': X.tolist(),
-        'weather_map': weather_map,
-        'activity_map': activity_map
-    }
+        log_info("Saving model artifact")
+        
+        header = write_artifact(MODEL_DIR, X, destination_names, weather_map, activity_map,
+                                {"n_neighbors": N_NEIGHBORS})
     
-    with open('model.pkl', 'wb') as f:
-        pickle.dump(model_data, f)
+    index_params = {"n_lists": args.n_lists, "nprobe": args.nprobe} if args.index != 'brute' else {}
+    model_data = build_derived(MODEL_DIR, args.index, index_params)
     
     result = {
         "status": "success",
         "message": "Model trained and saved successfully",
-        "destinations": len(destinations),
+        "destinations": header['n_destinations'],
         "weather_options": list(weather_map.keys()),
-        "activity_options": list(activity_map.keys())
+        "activity_options": list(activity_map.keys()),
+        "index": model_data['index'].kind,
+        "answer_table_entries": int(model_data['answer_table']['indices'][..., 0].size)
     }
     print(json.dumps(result))
 
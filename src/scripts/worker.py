@@ -0,0 +1,85 @@
+import sys
+import json
+import os
+import socket
+import socketserver
+
+from telemetry import log_info, prometheus_text, snapshot, stage
+
+def handle_line(handler, line, stats=None):
+    """Decode one newline-delimited JSON request and return the encoded response"""
+    request_id = None
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("Request must be a JSON object")
+        request_id = request.get('id')
+        if request.get('type') == 'ping':
+            response = {"success": True, "pong": True}
+        elif request.get('type') == 'stats':
+            response = {"success": True, "stats": dict(stats() if stats else {}, telemetry=snapshot())}
+        elif request.get('type') == 'metrics':
+            response = {"success": True, "metrics": prometheus_text()}
+        else:
+            response = handler(request.get('params', {}))
+    except ValueError as e:
+        response = {"error": f"Invalid request: {str(e)}", "success": False}
+    except Exception as e:
+        response = {"error": f"Unexpected error: {str(e)}", "success": False}
+
+    response = dict(response)
+    response['id'] = request_id
+    with stage("serialize"):
+        return json.dumps(response)
+
+def serve_stream(handler, infile, outfile, stats=None):
+    """Answer requests read from infile until EOF, one JSON line per response"""
+    for line in infile:
+        line = line.strip()
+        if not line:
+            continue
+        outfile.write(handle_line(handler, line, stats) + "\n")
+        outfile.flush()
+
+class _LineHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw in self.rfile:
+            line = raw.decode('utf-8').strip()
+            if not line:
+                continue
+            self.wfile.write((handle_line(self.server.handler, line, self.server.stats) + "\n").encode('utf-8'))
+            self.wfile.flush()
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def serve_socket(handler, socket_path, stats=None):
+    """Answer requests on a local Unix socket; each connection is a request stream"""
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = _UnixServer(socket_path, _LineHandler)
+    server.handler = handler
+    server.stats = stats
+    log_info("Worker listening", {"socket": socket_path})
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+def run_worker(handler, argv, stats=None):
+    """Run a long-lived worker on stdin/stdout, or on a Unix socket with --socket PATH
+
+    stats, if given, is called to answer {"type": "stats"} requests; {"type": "metrics"}
+    returns the telemetry counters and stage timers as Prometheus text.
+    """
+    if len(argv) == 2 and argv[0] == '--socket' and hasattr(socket, 'AF_UNIX'):
+        serve_socket(handler, argv[1], stats)
+        return
+    if argv:
+        print(json.dumps({"error": "Invalid worker arguments", "success": False}), file=sys.stdout)
+        sys.exit(1)
+
+    log_info("Worker ready", {"pid": os.getpid()})
+    serve_stream(handler, sys.stdin, sys.stdout, stats)
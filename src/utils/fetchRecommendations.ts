@@ -19,10 +19,31 @@ interface RecommendationResponse {
   success: boolean;
   error?: string;
   recommendations?: Recommendation[];
+  next_cursor?: string | null;
 }
 
-export default async function fetchRecommendations(budget: number, weather: string, activity: string) {
-  const response = await axios.post<RecommendationResponse>("/api/recommend", { budget, weather, activity });
+interface PageOptions {
+  k?: number;
+  offset?: number;
+  pool?: number;
+  cursor?: string;
+  // Relative feature weights, e.g. { budget: 2, nightlife: 0 }
+  weights?: Record<string, number>;
+  // Target scores in percent for safety, popularity, language, cuisine, nightlife
+  profile?: Record<string, number>;
+  // Hard constraints, applied before ranking
+  min_budget?: number;
+  max_budget?: number;
+  min_safety?: number;
+  weathers?: string[];
+  activities?: string[];
+  // Blend in similarity to this destination; 0 ranks by preference only, 1 by similarity only
+  similar_to?: string;
+  similarity_weight?: number;
+}
+
+export default async function fetchRecommendations(budget: number, weather: string, activity: string, page: PageOptions = {}) {
+  const response = await axios.post<RecommendationResponse>("/api/recommend", { budget, weather, activity, ...page });
   
   if (!response.data.success || response.data.error) {
     throw new Error(response.data.error || 'Failed to get recommendations');
@@ -34,3 +55,17 @@ export default async function fetchRecommendations(budget: number, weather: stri
   
   return response.data.recommendations.map(rec => rec.destination);
 }
+
+export async function fetchSimilarDestinations(destination: string, k: number = 5) {
+  const response = await axios.post<RecommendationResponse>("/api/recommend", { similar_to: destination, k });
+
+  if (!response.data.success || response.data.error) {
+    throw new Error(response.data.error || 'Failed to get similar destinations');
+  }
+
+  if (!response.data.recommendations || !Array.isArray(response.data.recommendations)) {
+    throw new Error('Invalid recommendations format received');
+  }
+
+  return response.data.recommendations.map(rec => rec.destination);
+}
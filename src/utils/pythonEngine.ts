@@ -0,0 +1,29 @@
+import { getWorkerPool } from "@/utils/pythonWorkerPool";
+
+const SERVICE_URL = process.env.PYTHON_SERVICE_URL;
+const SERVICE_TIMEOUT_MS = Number(process.env.PYTHON_SERVICE_TIMEOUT_MS || 10000);
+
+const SERVICE_ENDPOINTS: Record<string, string> = {
+  "recommend.py": "/recommend",
+  "suggest_activities.py": "/suggest-activities",
+};
+
+// Sends a request to a Python engine: the HTTP service (scripts/server.py) when
+// PYTHON_SERVICE_URL is set, otherwise a pool of long-lived worker processes.
+export async function requestEngine(scriptName: string, params: Record<string, unknown>): Promise<any> {
+  if (!SERVICE_URL) {
+    return getWorkerPool(scriptName).request(params);
+  }
+
+  const response = await fetch(SERVICE_URL.replace(/\/$/, "") + SERVICE_ENDPOINTS[scriptName], {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(params),
+    signal: AbortSignal.timeout(SERVICE_TIMEOUT_MS),
+  });
+  if (!response.ok) {
+    const body = await response.json().catch(() => ({}));
+    throw new Error(body.error || `Python service returned ${response.status}`);
+  }
+  return response.json();
+}
@@ -0,0 +1,258 @@
+import { spawn, ChildProcessWithoutNullStreams } from "child_process";
+import path from "path";
+import readline from "readline";
+
+interface PoolOptions {
+  size?: number;
+  maxQueue?: number;
+  timeoutMs?: number;
+}
+
+interface PendingRequest {
+  resolve: (value: any) => void;
+  reject: (error: Error) => void;
+  timer: NodeJS.Timeout;
+}
+
+interface QueuedRequest {
+  params: Record<string, unknown>;
+  resolve: (value: any) => void;
+  reject: (error: Error) => void;
+}
+
+interface Worker {
+  process: ChildProcessWithoutNullStreams;
+  pending: Map<number, PendingRequest>;
+  busy: boolean;
+  // Set once the process has exited or failed; a dead worker only waits for its replacement
+  dead: boolean;
+  // Killed on purpose (timeout), so its exit is not counted as a crash
+  retired: boolean;
+}
+
+const DEFAULT_POOL_SIZE = Number(process.env.PYTHON_WORKERS || 2);
+const DEFAULT_MAX_QUEUE = Number(process.env.PYTHON_WORKER_QUEUE || 100);
+const DEFAULT_TIMEOUT_MS = Number(process.env.PYTHON_WORKER_TIMEOUT_MS || 10000);
+// Restart delay doubles with each consecutive crash, from RESTART_BASE_MS up to RESTART_MAX_MS
+const RESTART_BASE_MS = 500;
+const RESTART_MAX_MS = 30000;
+// After this many crashes in a row without a successful response the pool stops restarting
+// workers and fails fast; the next request after DOWN_RETRY_MS tries a fresh start.
+const MAX_CONSECUTIVE_CRASHES = 8;
+const DOWN_RETRY_MS = 60000;
+
+export class PythonWorkerPool {
+  private workers: Worker[] = [];
+  private queue: QueuedRequest[] = [];
+  private nextId = 1;
+  private crashes = 0;
+  private downSince: number | null = null;
+  private readonly size: number;
+  private readonly maxQueue: number;
+  private readonly timeoutMs: number;
+
+  constructor(private readonly scriptPath: string, options: PoolOptions = {}) {
+    this.size = options.size ?? DEFAULT_POOL_SIZE;
+    this.maxQueue = options.maxQueue ?? DEFAULT_MAX_QUEUE;
+    this.timeoutMs = options.timeoutMs ?? DEFAULT_TIMEOUT_MS;
+    for (let i = 0; i < this.size; i++) {
+      this.workers.push(this.startWorker());
+    }
+  }
+
+  request(params: Record<string, unknown>): Promise<any> {
+    return new Promise((resolve, reject) => {
+      if (this.downSince !== null && Date.now() - this.downSince >= DOWN_RETRY_MS) {
+        this.revive();
+      }
+      if (this.workers.every((w) => w.dead)) {
+        reject(new Error("Recommendation engine is unavailable"));
+        return;
+      }
+      const worker = this.workers.find((w) => !w.busy && !w.dead);
+      if (worker) {
+        this.dispatch(worker, { params, resolve, reject });
+        return;
+      }
+      if (this.queue.length >= this.maxQueue) {
+        reject(new Error("Recommendation engine is overloaded"));
+        return;
+      }
+      this.queue.push({ params, resolve, reject });
+    });
+  }
+
+  private startWorker(): Worker {
+    const child = spawn("python", [this.scriptPath, "--worker"], {
+      cwd: path.dirname(this.scriptPath),
+      // Per-request debug/info records are not even built below this level
+      env: { ...process.env, ENGINE_LOG_LEVEL: process.env.ENGINE_LOG_LEVEL ?? "warning" },
+    });
+    const worker: Worker = { process: child, pending: new Map(), busy: false, dead: false, retired: false };
+
+    readline.createInterface({ input: child.stdout }).on("line", (line) => {
+      let response: any;
+      try {
+        response = JSON.parse(line);
+      } catch {
+        console.error("Invalid worker output:", line);
+        return;
+      }
+      const pending = worker.pending.get(response.id);
+      if (!pending) {
+        return;
+      }
+      clearTimeout(pending.timer);
+      worker.pending.delete(response.id);
+      delete response.id;
+      this.crashes = 0;
+      pending.resolve(response);
+      this.release(worker);
+    });
+
+    readline.createInterface({ input: child.stderr }).on("line", (line) => {
+      if (!line.startsWith("{")) {
+        console.error("Python worker stderr:", line);
+        return;
+      }
+      let record: any;
+      try {
+        record = JSON.parse(line);
+      } catch {
+        console.error("Python worker stderr:", line);
+        return;
+      }
+      if (record.type !== "log") {
+        // Metrics snapshots are read through the stats/metrics requests instead
+        return;
+      }
+      if (record.level === "error") {
+        console.error("Python worker:", record.message, record.data ?? "");
+      } else if (record.level === "warning") {
+        console.warn("Python worker:", record.message, record.data ?? "");
+      }
+    });
+
+    child.on("error", (error) => {
+      console.error("Python worker failed:", error);
+      this.workerDown(worker, "Python worker failed");
+    });
+
+    // Writes to a process that never started (or has just died) fail here rather than throwing
+    child.stdin.on("error", (error) => {
+      console.error("Python worker stdin error:", error);
+      this.workerDown(worker, "Python worker is not accepting requests");
+    });
+
+    child.on("exit", (code, signal) => {
+      console.error("Python worker exited:", code ?? signal);
+      this.workerDown(worker, "Python worker exited unexpectedly");
+    });
+
+    return worker;
+  }
+
+  // Fail the worker's in-flight requests and schedule its replacement; safe to call more than once
+  private workerDown(worker: Worker, reason: string) {
+    if (worker.dead) {
+      return;
+    }
+    worker.dead = true;
+    for (const pending of worker.pending.values()) {
+      clearTimeout(pending.timer);
+      pending.reject(new Error(reason));
+    }
+    worker.pending.clear();
+    const index = this.workers.indexOf(worker);
+    if (index === -1) {
+      return;
+    }
+
+    if (worker.retired) {
+      this.replace(index);
+      return;
+    }
+    this.crashes++;
+    if (this.crashes >= MAX_CONSECUTIVE_CRASHES) {
+      if (this.downSince === null) {
+        console.error(`Python workers crashed ${this.crashes} times in a row; not restarting for ${DOWN_RETRY_MS} ms`);
+        this.downSince = Date.now();
+      }
+    } else {
+      const delay = Math.min(RESTART_BASE_MS * 2 ** (this.crashes - 1), RESTART_MAX_MS);
+      setTimeout(() => {
+        if (this.workers[index] === worker && this.downSince === null) {
+          this.replace(index);
+        }
+      }, delay).unref();
+    }
+    if (this.workers.every((w) => w.dead)) {
+      this.rejectQueued();
+    }
+  }
+
+  private replace(index: number) {
+    const replacement = this.startWorker();
+    this.workers[index] = replacement;
+    this.drain(replacement);
+  }
+
+  // Start every dead slot again after the pool gave up
+  private revive() {
+    this.downSince = null;
+    this.crashes = 0;
+    this.workers.forEach((worker, index) => {
+      if (worker.dead) {
+        this.replace(index);
+      }
+    });
+  }
+
+  private rejectQueued() {
+    for (const request of this.queue.splice(0)) {
+      request.reject(new Error("Recommendation engine is unavailable"));
+    }
+  }
+
+  private dispatch(worker: Worker, request: QueuedRequest) {
+    const id = this.nextId++;
+    worker.busy = true;
+    const timer = setTimeout(() => {
+      worker.pending.delete(id);
+      request.reject(new Error("Python worker timed out"));
+      worker.retired = true;
+      worker.process.kill();
+    }, this.timeoutMs);
+    worker.pending.set(id, { resolve: request.resolve, reject: request.reject, timer });
+    worker.process.stdin.write(JSON.stringify({ id, params: request.params }) + "\n");
+  }
+
+  private release(worker: Worker) {
+    worker.busy = false;
+    this.drain(worker);
+  }
+
+  private drain(worker: Worker) {
+    if (worker.dead) {
+      return;
+    }
+    const next = this.queue.shift();
+    if (next) {
+      this.dispatch(worker, next);
+    }
+  }
+}
+
+const pools = globalThis as unknown as { __pythonWorkerPools?: Map<string, PythonWorkerPool> };
+
+export function getWorkerPool(scriptName: string): PythonWorkerPool {
+  if (!pools.__pythonWorkerPools) {
+    pools.__pythonWorkerPools = new Map();
+  }
+  let pool = pools.__pythonWorkerPools.get(scriptName);
+  if (!pool) {
+    pool = new PythonWorkerPool(path.join(process.cwd(), "src", "scripts", scriptName));
+    pools.__pythonWorkerPools.set(scriptName, pool);
+  }
+  return pool;
+}
@@ -0,0 +1,53 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'scripts')
+sys.path.insert(0, SCRIPT_DIR)
+os.environ.setdefault('ENGINE_LOG_LEVEL', 'warning')
+
+from bench_index import WEATHER_MAP, ACTIVITY_MAP, synthetic_features
+from model_store import write_artifact
+from recommend import N_NEIGHBORS, _page_cache, _page_cache_lock
+
+SCORE_FIELDS = ['safety', 'popularity', 'language', 'cuisine', 'nightlife']
+
+def build_artifact(artifact_dir, features, names, index_kind='brute'):
+    """Write an artifact with every derived file, the way train_model.py does"""
+    from train_model import build_derived
+
+    write_artifact(str(artifact_dir), features, names, WEATHER_MAP, ACTIVITY_MAP, {"n_neighbors": N_NEIGHBORS})
+    build_derived(str(artifact_dir), index_kind)
+    return str(artifact_dir)
+
+def catalogue_records(names, seed):
+    """Catalogue rows (name, budget, weather, activity, scores) as deltas.upsert_destinations takes them"""
+    rng = np.random.default_rng(seed)
+    weathers = list(WEATHER_MAP)
+    activities = list(ACTIVITY_MAP)
+    return [
+        dict({"name": name,
+              "budget": int(rng.integers(10, 101)) * 50,
+              "weather": weathers[rng.integers(len(weathers))],
+              "activity": activities[rng.integers(len(activities))]},
+             **{field: int(rng.integers(3, 11)) / 10 for field in SCORE_FIELDS})
+        for name in names
+    ]
+
+@pytest.fixture(autouse=True)
+def clear_page_cache():
+    with _page_cache_lock:
+        _page_cache.clear()
+    yield
+
+@pytest.fixture
+def base_catalogue():
+    n = 600
+    return synthetic_features(n, seed=3), [f"Destination {i}" for i in range(n)]
+
+@pytest.fixture
+def artifact(tmp_path, base_catalogue):
+    features, names = base_catalogue
+    return build_artifact(tmp_path / 'model', features, names)
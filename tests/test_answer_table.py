@@ -0,0 +1,41 @@
+import numpy as np
+
+from model_store import BUDGET_SCALE
+from recommend import (ANSWER_TABLE_STEP, N_NEIGHBORS, build_query_matrix, find_neighbors, kneighbors, load_model,
+                       recommend)
+
+def grid_profiles(model_data, budgets):
+    weathers = list(model_data['weather_map'])
+    activities = list(model_data['activity_map'])
+    profiles = [(b, w, a) for w in weathers for a in activities for b in budgets]
+    return [list(column) for column in zip(*profiles)]
+
+def live_answers(model_data, budgets, weathers, activities, k):
+    live = dict(model_data, answer_table=None)
+    return find_neighbors(live, budgets, weathers, activities, k)
+
+def test_table_matches_live_search_at_every_grid_point(artifact):
+    model_data = load_model(artifact)
+    assert model_data['answer_table']['indices'].shape[-1] == N_NEIGHBORS
+    budgets, weathers, activities = grid_profiles(
+        model_data, np.arange(0, BUDGET_SCALE + ANSWER_TABLE_STEP, ANSWER_TABLE_STEP))
+    for k in (1, 5, N_NEIGHBORS):
+        distances, indices = find_neighbors(model_data, budgets, weathers, activities, k)
+        live_distances, live_indices = live_answers(model_data, budgets, weathers, activities, k)
+        np.testing.assert_array_equal(indices, live_indices)
+        np.testing.assert_array_equal(distances, live_distances)
+
+def test_off_grid_and_clipped_budgets_match_live_search(artifact):
+    model_data = load_model(artifact)
+    budgets, weathers, activities = grid_profiles(model_data, [-100, 0.5, 1234.56, 2025, 4999, 7500])
+    distances, indices = find_neighbors(model_data, budgets, weathers, activities, 5)
+    live_distances, live_indices = live_answers(model_data, budgets, weathers, activities, 5)
+    np.testing.assert_array_equal(indices, live_indices)
+    np.testing.assert_allclose(distances, live_distances)
+
+def test_deeper_requests_bypass_the_table(artifact):
+    model_data = load_model(artifact)
+    queries = build_query_matrix([2000], ['warm'], ['beach'], model_data['weather_map'], model_data['activity_map'])
+    expected = kneighbors(model_data, queries, N_NEIGHBORS + 4)[1][0]
+    recommendations = recommend(model_data, 2000, 'warm', 'beach', N_NEIGHBORS + 4)
+    assert [r['destination'] for r in recommendations] == [model_data['destinations'][i] for i in expected]
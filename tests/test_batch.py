@@ -0,0 +1,24 @@
+import pytest
+
+from batch_recommend import score_chunk
+from recommend import handle_request, load_model, recommend_page
+
+def test_bad_rows_fail_alone(artifact):
+    model_data = load_model(artifact)
+    chunk = [{'id': 'nan', 'budget': float('nan'), 'weather': 'warm', 'activity': 'beach'},
+             {'id': 'inf', 'budget': 'inf', 'weather': 'warm', 'activity': 'beach'},
+             ValueError("Expecting value"),
+             {'budget': 2000, 'weather': 'warm', 'activity': 'beach'}]
+    responses = score_chunk(model_data, chunk, 3, offset=10)
+    assert [r['id'] for r in responses] == ['nan', 'inf', 12, 13]
+    assert [r['success'] for r in responses] == [False, False, False, True]
+    assert responses[0]['error'] == "Invalid input: budget must be a finite number"
+    assert len(responses[3]['recommendations']) == 3
+
+@pytest.mark.parametrize('budget', ['nan', 'inf', '-Infinity'])
+def test_non_finite_budget_is_invalid_input(artifact, budget):
+    model_data = load_model(artifact)
+    response = handle_request(model_data, {'budget': budget, 'weather': 'warm', 'activity': 'beach'})
+    assert response == {"error": "Invalid input: budget must be a finite number", "success": False}
+    with pytest.raises(ValueError):
+        recommend_page(model_data, float(budget), 'warm', 'beach')
@@ -0,0 +1,153 @@
+import os
+import sys
+import shutil
+import subprocess
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import SCRIPT_DIR, WEATHER_MAP, ACTIVITY_MAP, build_artifact, catalogue_records
+from deltas import compact, read_manifest, remove_destinations, upsert_destinations
+from ingest import append_catalogue, encode_chunk
+from model_store import read_header
+from recommend import LiveModel, open_model, recommend
+
+QUERIES = [(600, 'cold', 'history'), (2400, 'warm', 'beach'), (3700, 'mild', 'culture'), (5000, 'cool', 'urban')]
+FILTERS = [None, {'max_budget': 2500}, {'activities': ['beach', 'urban'], 'min_safety': 50},
+           {'weathers': ['warm'], 'weights': {'activity': 2}}]
+
+def apply_updates(artifact_dir):
+    """Three segments: new rows, a replacement of base and delta rows, and removals of both"""
+    upsert_destinations(artifact_dir, catalogue_records([f"New {i}" for i in range(40)], seed=10))
+    upsert_destinations(artifact_dir, catalogue_records(
+        [f"Destination {i}" for i in range(0, 100, 7)] + ["New 3", "New 11"], seed=11))
+    remove_destinations(artifact_dir, [f"Destination {i}" for i in range(50, 80)] + ["New 5", "Destination 14"])
+
+def expected_catalogue(base_features, base_names):
+    """Rows the updates leave, base survivors in order then the live delta rows, built without deltas.py"""
+    first = catalogue_records([f"New {i}" for i in range(40)], seed=10)
+    second = catalogue_records([f"Destination {i}" for i in range(0, 100, 7)] + ["New 3", "New 11"], seed=11)
+    removed = {f"Destination {i}" for i in range(50, 80)} | {"New 5", "Destination 14"}
+    replaced = {r['name'] for r in second}
+
+    survivors = [i for i, name in enumerate(base_names) if name not in replaced and name not in removed]
+    records = [r for r in first if r['name'] not in replaced and r['name'] not in removed]
+    records += [r for r in second if r['name'] not in removed]
+    features, names, _ = encode_chunk(pd.DataFrame(records), WEATHER_MAP, ACTIVITY_MAP)
+    return (np.concatenate([base_features[survivors], features]),
+            [base_names[i] for i in survivors] + names)
+
+def answers(model_data, k=10):
+    return [recommend(model_data, budget, weather, activity, k, 0, None, filters)
+            for budget, weather, activity in QUERIES for filters in FILTERS]
+
+@pytest.fixture
+def reference(tmp_path, base_catalogue):
+    features, names = expected_catalogue(*base_catalogue)
+    return build_artifact(tmp_path / 'reference', features, names)
+
+def test_merged_deltas_answer_like_a_rebuilt_artifact(artifact, reference):
+    apply_updates(artifact)
+    merged = open_model(artifact)
+    rebuilt = open_model(reference)
+
+    assert merged['deltas'] == {"segments": 3, "hidden_base_rows": 41, "delta_rows": 49}
+    assert merged['header']['n_destinations'] == rebuilt['header']['n_destinations']
+    assert answers(merged) == answers(rebuilt)
+
+def test_merged_deltas_hide_removed_and_replaced_rows(artifact):
+    apply_updates(artifact)
+    merged = open_model(artifact)
+    seen = {r['destination'] for page in answers(merged, k=100) for r in page}
+    assert not seen & {"Destination 60", "New 5", "Destination 14"}
+
+    # A replaced destination appears once, with its updated values
+    walked = recommend(merged, 2000, 'mild', 'beach', 100, 0, 1000)
+    names = [r['destination'] for r in walked]
+    assert len(names) == len(set(names))
+
+def test_compaction_matches_a_rebuilt_artifact(artifact, reference):
+    apply_updates(artifact)
+    stats = compact(artifact)
+    assert stats["segments"] == 3
+
+    compacted = open_model(artifact)
+    rebuilt = open_model(reference)
+    assert compacted.get('deltas') is None
+    assert compacted['header']['content_hash'] == rebuilt['header']['content_hash']
+    assert compacted['destinations'] == rebuilt['destinations']
+    np.testing.assert_array_equal(compacted['features'], rebuilt['features'])
+    assert answers(compacted) == answers(rebuilt)
+    assert read_manifest(artifact) is None
+
+def test_compaction_is_idempotent(artifact):
+    apply_updates(artifact)
+    compact(artifact)
+    header = read_header(artifact)
+    files = {name: os.path.getmtime(os.path.join(artifact, name)) for name in os.listdir(artifact)}
+    before = answers(open_model(artifact))
+
+    assert compact(artifact) is None
+    assert read_header(artifact) == header
+    assert {name: os.path.getmtime(os.path.join(artifact, name)) for name in os.listdir(artifact)} == files
+    assert answers(open_model(artifact)) == before
+
+def test_compacting_in_steps_equals_compacting_once(tmp_path, artifact):
+    once = str(tmp_path / 'once')
+    shutil.copytree(artifact, once)
+    apply_updates(once)
+    compact(once)
+
+    upsert_destinations(artifact, catalogue_records([f"New {i}" for i in range(40)], seed=10))
+    compact(artifact)
+    upsert_destinations(artifact, catalogue_records(
+        [f"Destination {i}" for i in range(0, 100, 7)] + ["New 3", "New 11"], seed=11))
+    remove_destinations(artifact, [f"Destination {i}" for i in range(50, 80)] + ["New 5", "Destination 14"])
+    compact(artifact)
+
+    # Survivors keep their order and updates are appended, so both runs write the same rows
+    assert read_header(artifact)['content_hash'] == read_header(once)['content_hash']
+    assert answers(open_model(artifact)) == answers(open_model(once))
+
+def test_live_model_swaps_in_deltas_and_compactions(artifact):
+    live = LiveModel(artifact, interval=0)
+    original = live.model
+    assert live.refresh() is False
+
+    upsert_destinations(artifact, catalogue_records(["Brand New"], seed=12))
+    assert live.refresh() is True
+    assert live.model is not original
+    assert "Brand New" in live.model['destinations']
+    assert live.model['header']['content_hash'] != original['header']['content_hash']
+    # The old version keeps answering for requests that already hold it
+    assert "Brand New" not in original['destinations']
+    assert len(recommend(original, 2400, 'warm', 'beach', 5)) == 5
+
+    merged = live.model
+    compact(artifact)
+    assert live.refresh() is True
+    assert live.model.get('deltas') is None
+    assert answers(live.model) == answers(merged)
+    assert live.reloads == 2
+
+def test_append_keeps_pending_deltas(tmp_path, artifact):
+    upsert_destinations(artifact, catalogue_records(["Zanzibar"], seed=13))
+    remove_destinations(artifact, ["Destination 5"])
+    catalogue = tmp_path / 'extra.csv'
+    pd.DataFrame(catalogue_records(["Appended"], seed=14)).to_csv(catalogue, index=False)
+
+    subprocess.run([sys.executable, 'ingest.py', str(catalogue), '--artifact', artifact, '--append'],
+                   cwd=SCRIPT_DIR, check=True, capture_output=True)
+    appended = open_model(artifact)
+    assert appended.get('deltas') is None
+    assert {"Zanzibar", "Appended"} <= set(appended['destinations'])
+    assert "Destination 5" not in appended['destinations']
+    assert len(appended['destinations']) == 601
+
+def test_append_refuses_pending_deltas(tmp_path, artifact):
+    upsert_destinations(artifact, catalogue_records(["Zanzibar"], seed=13))
+    catalogue = tmp_path / 'extra.csv'
+    pd.DataFrame(catalogue_records(["Appended"], seed=14)).to_csv(catalogue, index=False)
+    with pytest.raises(ValueError):
+        append_catalogue(str(catalogue), artifact)
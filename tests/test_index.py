@@ -0,0 +1,59 @@
+import numpy as np
+
+from bench_index import synthetic_features, synthetic_queries
+from index import BruteForceIndex, IVFIndex, search_rows, select_topk
+
+def test_select_topk_matches_stable_argsort():
+    rng = np.random.default_rng(0)
+    # Few distinct values, so most rows have ties across the k-th place
+    distances = rng.integers(0, 6, (200, 50)).astype(float)
+    for k in (1, 5, 17, 50, 80):
+        order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        got_distances, got_columns = select_topk(distances, k)
+        np.testing.assert_array_equal(got_columns, order)
+        np.testing.assert_array_equal(got_distances, np.take_along_axis(distances, order, axis=1))
+
+def test_select_topk_breaks_ties_to_lower_column():
+    distances = np.array([[1.0, 0.5, 1.0, 0.5, 1.0, 1.0]])
+    _, columns = select_topk(distances, 4)
+    assert columns.tolist() == [[1, 3, 0, 2]]
+
+def test_select_topk_is_repeatable():
+    distances = np.zeros((3, 1000))
+    first = select_topk(distances, 10)[1]
+    assert first.tolist() == [list(range(10))] * 3
+    for _ in range(5):
+        np.testing.assert_array_equal(select_topk(distances, 10)[1], first)
+
+def test_search_rows_ties_resolve_to_lower_row():
+    features = np.tile(np.arange(12, dtype=np.float32), (40, 1))
+    queries = features[:2].astype(float)
+    _, indices = search_rows(features, queries, 5)
+    assert indices.tolist() == [[0, 1, 2, 3, 4]] * 2
+    _, indices = search_rows(features, queries, 3, rows=np.array([7, 9, 30, 31]))
+    assert indices.tolist() == [[7, 9, 30]] * 2
+
+def test_brute_force_blocked_search_matches_small_search():
+    features = synthetic_features(3000, seed=1)
+    queries = synthetic_queries(20, seed=2)
+    expected = BruteForceIndex(features).search(queries, 10)
+    blocked = BruteForceIndex(features, block_elements=12 * 256).search(queries, 10)
+    np.testing.assert_array_equal(blocked[1], expected[1])
+    np.testing.assert_allclose(blocked[0], expected[0])
+
+def test_ivf_probing_every_cell_is_exact():
+    features = synthetic_features(2000, seed=4)
+    queries = synthetic_queries(30, seed=5)
+    index = IVFIndex.build(features, n_lists=20)
+    expected = BruteForceIndex(features).search(queries, 8)
+    got = index.search(queries, 8, nprobe=len(index.centroids))
+    np.testing.assert_array_equal(got[1], expected[1])
+    np.testing.assert_allclose(got[0], expected[0])
+
+def test_ivf_returns_k_rows_when_probed_cells_are_small():
+    features = synthetic_features(500, seed=6)
+    index = IVFIndex.build(features, n_lists=100, nprobe=1)
+    distances, indices = index.search(synthetic_queries(10, seed=7), 30)
+    assert indices.shape == (10, 30)
+    assert all(len(set(row)) == 30 for row in indices.tolist())
+    assert (np.diff(distances, axis=1) >= 0).all()
@@ -0,0 +1,66 @@
+import itertools
+
+import pytest
+
+from itinerary import candidate_rows, plan_itinerary
+from suggest_activities import TIME_SLOTS, activity_index, get_destination_features, handle_request, score_rows
+
+def placed(plan):
+    return [entry for day in plan['days'] for entry in day['activities']]
+
+def names_of_type(activity_type):
+    return {activity_index['records'][row]['name'] for row in candidate_rows(activity_index, [activity_type])}
+
+@pytest.mark.parametrize('days,budget,max_hours', [(1, 1500, 10), (3, 400, 6), (5, 5000, 12), (12, 2500, 8)])
+def test_plans_respect_budget_hours_and_use_each_activity_once(days, budget, max_hours):
+    plan = plan_itinerary('Kyoto', 'mild', days, budget, None, max_hours)
+    assert [day['day'] for day in plan['days']] == list(range(1, days + 1))
+    assert plan['total_cost'] <= budget + 0.01
+    assert all(day['hours'] <= max_hours for day in plan['days'])
+    names = [entry['name'] for entry in placed(plan)]
+    assert len(names) == len(set(names)) > 0
+    for day in plan['days']:
+        slots = [entry['time_of_day'] for entry in day['activities']]
+        assert len(slots) == len(set(slots))
+
+def best_day(destination, weather, budget, types, max_hours):
+    """Highest score over every (morning, afternoon, evening) choice, free time included"""
+    index = activity_index
+    features = get_destination_features(destination)
+    rows = candidate_rows(index, types)
+    scores = [score_rows(index, rows, weather, slot, [features])[0] for slot in TIME_SLOTS]
+    costs = budget * index['cost_factor'][rows] * features.get('cost_level', 1.0)
+    hours = index['duration'][rows]
+    best = 0.0
+    for picks in itertools.product(range(len(rows) + 1), repeat=3):
+        used = [(slot, c) for slot, c in enumerate(picks) if c < len(rows)]
+        columns = [c for _, c in used]
+        if len(set(columns)) < len(columns):
+            continue
+        if sum(hours[c] for c in columns) > max_hours or sum(costs[c] for c in columns) > budget + 1e-9:
+            continue
+        best = max(best, sum(scores[slot][c] for slot, c in used))
+    return round(best, 2)
+
+@pytest.mark.parametrize('budget,max_hours', [(300, 8), (60, 5), (5000, 24)])
+def test_one_day_with_every_option_is_the_best_triple(budget, max_hours):
+    types = ['beach', 'culture']
+    plan = plan_itinerary('Barcelona', 'warm', 1, budget, types, max_hours, beam_width=64, per_slot=14)
+    assert plan['total_score'] == best_day('Barcelona', 'warm', budget, types, max_hours)
+
+def test_requested_types_only():
+    plan = plan_itinerary('Reykjavik', 'cold', 4, 3000, ['history'])
+    assert {entry['name'] for entry in placed(plan)} <= names_of_type('history')
+    with pytest.raises(ValueError):
+        plan_itinerary('Reykjavik', 'cold', 4, 3000, ['skydiving'])
+
+def test_a_single_activity_type_string_is_one_type():
+    response = handle_request({'destination': 'Lisbon', 'weather': 'mild', 'days': 2, 'budget': 1200,
+                               'activity_types': 'culture'})
+    names = {entry['name'] for entry in placed(response['itinerary'])}
+    assert names and names <= names_of_type('culture')
+
+    response = handle_request({'destinations': 'Lisbon', 'weather': 'mild', 'budget': 1200,
+                               'activity_types': 'culture'})
+    assert list(response['suggestions']) == ['Lisbon']
+    assert list(response['suggestions']['Lisbon']) == ['culture']
@@ -0,0 +1,38 @@
+import pytest
+
+from bench_matcher import nested_lookup, substring_scan, synthetic_names
+from suggest_activities import (KEYWORD_RULES, default_features, destination_features, get_destination_features,
+                                keyword_features, normalize_name)
+
+def test_keyword_matcher_fires_the_same_rules_as_substring_scans():
+    names = [normalize_name(name) for name in synthetic_names(5000, seed=3)]
+    for name in names:
+        assert keyword_features(name) == substring_scan(name), name
+
+@pytest.mark.parametrize('name', ['oldport', 'seacoast', 'marseille', 'smartcity', 'parkislandbay', 'burgundy'])
+def test_overlapping_and_nested_keywords_all_fire(name):
+    assert keyword_features(name) == substring_scan(name)
+
+def test_every_rule_fires_on_its_own_keywords():
+    for words, values, floors in KEYWORD_RULES:
+        for word in words:
+            features = keyword_features(f"north {word} heights")
+            assert all(features[key] == value for key, value in values.items()), word
+            assert all(features[key] >= floor for key, floor in floors.items()), word
+
+def test_known_destinations_resolve_whatever_the_spelling():
+    for category in destination_features.values():
+        for name, features in category.items():
+            assert get_destination_features(name) == nested_lookup(name)
+            assert get_destination_features(f"  {name.upper()}  ") == features
+    assert get_destination_features('São Paulo') == get_destination_features('sao paulo')
+
+def test_aliases_and_unknown_names():
+    assert get_destination_features('NYC') == get_destination_features('New York')
+    assert get_destination_features('  the   maldives ') == get_destination_features('Maldives')
+    assert get_destination_features('Qwzx') == default_features
+    assert get_destination_features('Palma Bay') == substring_scan('palma bay')
+
+def test_normalize_name():
+    assert normalize_name('  Zürich\tOld  Town ') == 'zurich old town'
+    assert normalize_name('KRAKÓW') == normalize_name('krakow')
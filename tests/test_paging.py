@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from recommend import decode_cursor, load_model, recommend_page
+
+def walk_pages(model_data, budget, weather, activity, k, pool=None, filters=None):
+    """Every page of one query, following cursors until there is none"""
+    pages = []
+    recommendations, cursor = recommend_page(model_data, budget, weather, activity, k, 0, pool, filters)
+    pages.append(recommendations)
+    while cursor:
+        budget, weather, activity, offset, k, pool, filters = decode_cursor(cursor)
+        recommendations, cursor = recommend_page(model_data, budget, weather, activity, k, offset, pool, filters)
+        pages.append(recommendations)
+    return pages
+
+def destinations(recommendations):
+    return [r['destination'] for r in recommendations]
+
+@pytest.fixture
+def model_data(artifact):
+    return load_model(artifact)
+
+@pytest.mark.parametrize('k,pool', [(5, None), (7, None), (10, 40), (1, 3)])
+def test_pages_cover_the_catalogue_without_gaps_or_duplicates(model_data, k, pool):
+    pages = walk_pages(model_data, 2400, 'warm', 'beach', k, pool)
+    assert all(pages), "a cursor led to an empty page"
+    assert all(len(page) == k for page in pages[:-1])
+
+    walked = [r for page in pages for r in page]
+    assert len(walked) == len(model_data['features'])
+    assert len(set(destinations(walked))) == len(walked)
+    scores = [r['match_score'] for r in walked]
+    assert scores == sorted(scores, reverse=True)
+
+def test_pages_match_one_large_page(model_data):
+    pages = walk_pages(model_data, 1800, 'mild', 'culture', 9)
+    walked = [r for page in pages for r in page][:90]
+    assert walked == recommend_page(model_data, 1800, 'mild', 'culture', 90)[0]
+
+def matching_rows(model_data, filters):
+    """Number of destinations passing the hard constraints, counted straight from the decoded columns"""
+    labels = np.asarray(model_data['labels'])
+    display = np.asarray(model_data['display'])
+    weathers = list(model_data['weather_map'])
+    activities = list(model_data['activity_map'])
+    keep = np.ones(len(labels), dtype=bool)
+    if 'min_budget' in filters:
+        keep &= display[:, 0] >= filters['min_budget']
+    if 'max_budget' in filters:
+        keep &= display[:, 0] <= filters['max_budget']
+    if 'min_safety' in filters:
+        keep &= display[:, 1] >= filters['min_safety']
+    if 'weathers' in filters:
+        keep &= np.isin(labels[:, 0], [weathers.index(w) for w in filters['weathers']])
+    if 'activities' in filters:
+        keep &= np.isin(labels[:, 1], [activities.index(a) for a in filters['activities']])
+    return int(keep.sum())
+
+@pytest.mark.parametrize('filters', [
+    {'max_budget': 1500, 'activities': ['beach']},
+    {'weathers': ['cold', 'cool'], 'min_safety': 60},
+    {'min_budget': 4500, 'weights': {'budget': 3}}
+])
+def test_filtered_pages_cover_every_match(model_data, filters):
+    everything = [r for page in walk_pages(model_data, 2000, 'cool', 'history', 100, None, filters) for r in page]
+    assert len(everything) == matching_rows(model_data, filters) > 0
+    assert len(set(destinations(everything))) == len(everything)
+    for k in (1, 4, 9):
+        pages = walk_pages(model_data, 2000, 'cool', 'history', k, None, filters)
+        assert all(pages), "a cursor led to an empty page"
+        assert [r for page in pages for r in page] == everything
+
+def test_no_cursor_when_matches_exactly_fill_the_page(model_data):
+    filters = {'max_budget': 1000, 'activities': ['urban']}
+    matches = recommend_page(model_data, 900, 'warm', 'urban', 100, 0, 1000, filters)[0]
+    assert 1 < len(matches) < 100
+
+    recommendations, cursor = recommend_page(model_data, 900, 'warm', 'urban', len(matches), 0, None, filters)
+    assert recommendations == matches
+    assert cursor is None
+
+    half = len(matches) // 2
+    recommendations, cursor = recommend_page(model_data, 900, 'warm', 'urban', half, len(matches) - half, None, filters)
+    assert recommendations == matches[-half:]
+    assert cursor is None
+
+def test_default_page_at_a_grid_budget_comes_from_the_answer_table(model_data, monkeypatch):
+    import recommend
+
+    live = recommend_page(dict(model_data, answer_table=None), 2000, 'warm', 'beach')
+
+    def no_live_search(*args, **kwargs):
+        raise AssertionError("grid-budget page ran a live search")
+
+    monkeypatch.setattr(recommend, 'kneighbors', no_live_search)
+    recommend._page_cache.clear()
+    assert recommend_page(model_data, 2000, 'warm', 'beach') == live
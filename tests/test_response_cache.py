@@ -0,0 +1,92 @@
+import pytest
+
+import recommend
+import suggest_activities
+from recommend import handle_request, load_model
+from response_cache import ResponseCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture(autouse=True)
+def clear_response_caches():
+    recommend.response_cache.clear()
+    suggest_activities.response_cache.clear()
+    yield
+    recommend.response_cache.clear()
+    suggest_activities.response_cache.clear()
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2, ttl_seconds=0)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats()['evictions'] == 1
+
+def test_entries_expire_after_the_ttl():
+    clock = FakeClock()
+    cache = ResponseCache(ttl_seconds=10, clock=clock)
+    cache.put('a', 1)
+    clock.now = 10
+    assert cache.get('a') == 1
+    clock.now = 10.5
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+def test_a_new_version_drops_every_entry():
+    cache = ResponseCache()
+    cache.put('a', 1, version='v1')
+    assert cache.get('a', 'v1') == 1
+    assert cache.get('a', 'v2') is None
+    assert cache.get('a', 'v1') is None
+    assert cache.stats()['invalidations'] == 1
+
+def test_equivalent_requests_share_an_entry(artifact):
+    model_data = load_model(artifact)
+    before = recommend.response_cache.stats()
+    first = handle_request(model_data, {'budget': 2000, 'weather': 'warm', 'activity': 'beach', 'k': 5})
+    again = handle_request(model_data, {'budget': '2000.001', 'weather': 'Warm', 'activity': 'BEACH', 'k': 5})
+    assert again is first
+    # Budgets past the scale clip to the same query, and so to the same entry
+    assert handle_request(model_data, {'budget': 9e9, 'weather': 'warm', 'activity': 'beach'}) is \
+        handle_request(model_data, {'budget': 1e12, 'weather': 'warm', 'activity': 'beach'})
+    assert handle_request(model_data, {'budget': 2000, 'weather': 'warm', 'activity': 'beach', 'k': 6}) is not first
+
+    stats = recommend.response_cache.stats()
+    assert (stats['hits'] - before['hits'], stats['misses'] - before['misses']) == (2, 3)
+
+def test_a_new_artifact_is_not_answered_from_the_cache(artifact):
+    model_data = load_model(artifact)
+    params = {'budget': 2000, 'weather': 'warm', 'activity': 'beach'}
+    first = handle_request(model_data, params)
+    changed = dict(model_data, header=dict(model_data['header'], content_hash='changed'))
+    assert handle_request(changed, params) is not first
+    assert handle_request(model_data, params) is not first
+
+def test_errors_are_not_cached(artifact):
+    model_data = load_model(artifact)
+    assert not handle_request(model_data, {'budget': 2000, 'weather': 'warm', 'activity': 'beach', 'k': 0})['success']
+    assert recommend.response_cache.stats()['entries'] == 0
+
+    suggest = suggest_activities.handle_request
+    assert 'error' in suggest({'destination': 'Kyoto', 'weather': 'mild', 'activity_type': 'skydiving',
+                               'budget': 100})['suggestions'][0]
+    assert suggest_activities.response_cache.stats()['entries'] == 0
+
+def test_suggestions_share_an_entry_across_spellings():
+    suggest = suggest_activities.handle_request
+    hits = suggest_activities.response_cache.stats()['hits']
+    first = suggest({'destination': 'Kyoto', 'weather': 'mild', 'activity_type': 'culture', 'budget': 100})
+    again = suggest({'destination': '  KYOTO ', 'weather': 'Mild ', 'activity_type': 'Culture', 'budget': 100.001})
+    assert suggest_activities.response_cache.stats()['hits'] == hits + 1
+    assert [s['name'] for s in again['suggestions']] == [s['name'] for s in first['suggestions']]
+    # Each response names the destination the way its request did
+    assert again['suggestions'][0]['destination_specific'].endswith(' in   KYOTO ')
+    assert first['suggestions'][0]['destination_specific'].endswith(' in Kyoto')
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from bench_index import synthetic_features
+from index import IVFIndex
+from recommend import open_model, recommend_similar
+from similarity import cell_graph, destination_row, exact_graph, similar_neighbors
+
+def brute_force_graph(features, m):
+    """Nearest m other rows per row by a full sort, ties to the lower row"""
+    data = np.asarray(features, dtype=float)
+    distances = np.linalg.norm(data[:, None, :] - data[None, :, :], axis=2)
+    np.fill_diagonal(distances, np.inf)
+    order = np.argsort(distances, axis=1, kind='stable')[:, :m]
+    return np.take_along_axis(distances, order, axis=1), order
+
+def test_exact_graph_matches_brute_force():
+    features = synthetic_features(700, seed=8)
+    expected_distances, expected_indices = brute_force_graph(features, 12)
+    distances, indices = exact_graph(features, 12)
+    np.testing.assert_allclose(distances, expected_distances, rtol=1e-6)
+    np.testing.assert_array_equal(indices, expected_indices)
+    assert not (indices == np.arange(len(features))[:, None]).any()
+
+def test_cell_graph_probing_every_cell_is_exact():
+    features = synthetic_features(700, seed=9)
+    index = IVFIndex.build(features, n_lists=12)
+    expected_distances, _ = brute_force_graph(features, 8)
+    distances, indices = cell_graph(index, features, 8, probes=len(index.centroids))
+    np.testing.assert_allclose(distances, expected_distances, rtol=1e-6)
+    assert not (indices == np.arange(len(features))[:, None]).any()
+
+def test_similar_neighbors_agree_with_the_graph_and_live_search(artifact):
+    model_data = open_model(artifact)
+    graph = model_data['similarity']
+    assert graph is not None and graph['exact']
+    width = graph['indices'].shape[1]
+    for row in (0, 17, 599):
+        from_graph = similar_neighbors(model_data, row, width)
+        live = similar_neighbors(dict(model_data, similarity=None), row, width)
+        np.testing.assert_allclose(from_graph[0], live[0], rtol=1e-5)
+        assert row not in from_graph[1].tolist()
+
+def test_similar_destinations_exclude_the_anchor(artifact):
+    model_data = open_model(artifact)
+    anchor = model_data['destinations'][42]
+    assert destination_row(model_data, f"  {anchor.upper()} ") == 42
+    for budget in (None, 1500):
+        recommendations = recommend_similar(model_data, anchor, 10, budget=budget, weather='warm', activity='beach')
+        names = [r['destination'] for r in recommendations]
+        assert len(names) == 10 and anchor not in names and len(set(names)) == 10
+
+def test_unknown_destination_is_rejected(artifact):
+    with pytest.raises(ValueError):
+        destination_row(open_model(artifact), "Nowhere At All")